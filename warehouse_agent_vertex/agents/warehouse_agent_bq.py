@@ -1,3 +1,4 @@
+import atexit
 from langchain.agents import Tool, AgentType, initialize_agent
 from langchain.agents.agent_toolkits import SQLDatabaseToolkit
 from langchain.utilities import SQLDatabase
@@ -5,12 +6,17 @@ from langchain.utilities import SQLDatabase
 from langchain_google_vertexai import ChatVertexAI
 from scripts.vertex_init import init_vertex
 from scripts.config import config
-from scripts.cross_sell_bq import get_cross_sells
+from scripts.cross_sell_bq import get_basket_cross_sells, get_cross_sells
+from scripts.instrumentation import init_tracing, instrument_tools, trace_callbacks
+from scripts.restock_bq import bulk_restock_tool
+from scripts.intent_router import IntentRouter
+from scripts.tool_compaction import BudgetExceeded, compact_tools, token_budget
 
 from google.cloud import bigquery
 
-# Init Vertex
+# Init Vertex (+ BigQuery job tracing when WAREHOUSE_TRACE=1)
 init_vertex()
+init_tracing()
 
 # DB via SQLAlchemy BigQuery dialect
 db = SQLDatabase.from_uri(config.SQLALCHEMY_BQ_URI)
@@ -77,10 +83,59 @@ cross_sell_tool = Tool(
     description="Suggest cross-sell items: input SKU id"
 )
 
-tools = sql_tools + [forecast_tool, restock_tool, cross_sell_tool]
+bulk_restock = Tool(
+    name="BulkRestock",
+    func=bulk_restock_tool,
+    description=("Restock every SKU inventory_plan flags, in one call: input empty (all SKUs) or SKU ids; "
+                 "add 'dry-run' to preview. Small orders are placed, large ones go to approval. "
+                 "Prefer this over RestockOrder for more than one SKU")
+)
+
+basket_cross_sell_tool = Tool(
+    name="BasketCrossSell",
+    func=get_basket_cross_sells,
+    description="Suggest items to add to a basket: input comma-separated SKU ids"
+)
+
+def hybrid_tools() -> list:
+    """Hybrid recommenders named in HYBRID_TOOLS (opt-in: they need custom_item_vecs and embeddings)."""
+    wanted = {n.strip() for n in config.HYBRID_TOOLS.split(",") if n.strip()}
+    out = []
+    if "VertexHybridCrossSell" in wanted:
+        from vertex_hybrid_reco_bundle.agents.vertex_hybrid_tool import VertexHybridCrossSell
+        out.append(VertexHybridCrossSell)
+    if "HybridVertexCrossSell" in wanted:
+        from vertex_hybrid_reco_bundle.agents.hybrid_vertex_tool import HybridVertexCrossSell
+        out.append(HybridVertexCrossSell)
+    return out
+
+# Tool outputs are compacted to a token allowance; large results are paged via ResultPage
+tools = instrument_tools(compact_tools(
+    sql_tools + [forecast_tool, restock_tool, bulk_restock, cross_sell_tool, basket_cross_sell_tool]
+    + hybrid_tools(),
+    engine=db._engine))   # same engine as the SQL toolkit
+
+if config.AGENT_MODE == "parallel":
+    # Native tool calling; independent calls in one step run concurrently
+    from scripts.parallel_agent import ParallelToolAgent
+    agent = ParallelToolAgent(llm, tools)
+    atexit.register(agent.close)
+else:
+    agent = initialize_agent(tools, llm, agent=AgentType.ZERO_SHOT_REACT_DESCRIPTION, verbose=True)
+
+# Routine questions (forecast / cross-sell / price for a SKU, low stock) skip the LLM
+router = IntentRouter() if config.ROUTER_ENABLED else None
 
-agent = initialize_agent(tools, llm, agent=AgentType.ZERO_SHOT_REACT_DESCRIPTION, verbose=True)
+def ask(question: str) -> str:
+    answer = router.route(question) if router else None
+    if answer is not None:
+        return answer
+    with token_budget() as budget:
+        try:
+            return agent.run(question, callbacks=trace_callbacks() + [budget.callback()])
+        except BudgetExceeded as e:
+            return str(e)
 
 if __name__ == "__main__":
     q = "List SKUs below safety stock and suggest restocks for next week"
-    print(agent.run(q))
+    print(ask(q))
@@ -1,5 +1,8 @@
 from fastapi import FastAPI
 from app.routes import router
+from scripts.instrumentation import init_tracing
+
+init_tracing()
 
 app = FastAPI(title="Warehouse Agent API (Vertex)")
 
@@ -1,6 +1,8 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException
 from google.cloud import bigquery
 from scripts.config import config
+from scripts.cross_sell_index import get_index, refresh_index
+from scripts.restock_bq import bulk_restock
 
 router = APIRouter()
 
@@ -17,3 +19,36 @@ def approve_action(action_id: str):
     ))
     job.result()
     return {"msg": "Approved"}
+
+@router.post("/approve/batch/{batch_id}")
+def approve_batch(batch_id: str):
+    client = bigquery.Client(project=config.GCP_PROJECT_ID)
+    sql = f"""
+      UPDATE `{config.GCP_PROJECT_ID}.{config.BQ_DATASET}.pending_actions`
+      SET status='APPROVED'
+      WHERE batch_id = @batch_id AND status = 'PENDING'
+    """
+    job = client.query(sql, job_config=bigquery.QueryJobConfig(
+        query_parameters=[bigquery.ScalarQueryParameter("batch_id","STRING",batch_id)]
+    ))
+    job.result()
+    return {"msg": "Approved", "actions": job.num_dml_affected_rows}
+
+@router.post("/restock/bulk")
+def restock_bulk(skus: str = None, min_qty: int = 1, limit: int = None, dry_run: bool = False):
+    res = bulk_restock(skus=[s for s in (skus or "").split(",") if s] or None,
+                       min_qty=min_qty, limit=limit, dry_run=dry_run)
+    return {k: res[k] for k in ("batch_id", "dry_run", "placed", "pending", "skipped")}
+
+@router.get("/cross_sell")
+def cross_sell(skus: str, top_n: int = 5):
+    basket = [s.strip() for s in skus.split(",") if s.strip()]
+    if not basket:
+        raise HTTPException(status_code=400, detail="skus must list at least one SKU id")
+    index = get_index()
+    recs = index.top(basket[0], top_n) if len(basket) == 1 else index.basket(basket, top_n)
+    return {"skus": basket, "suggestions": [{"sku": s, "score": v} for s, v in recs]}
+
+@router.post("/cross_sell/refresh")
+def cross_sell_refresh():
+    return refresh_index().memory_report()
@@ -0,0 +1,160 @@
+"""Local BigQuery stand-in backed by DuckDB.
+
+LocalBigQueryClient implements the slice of google.cloud.bigquery.Client the
+pipeline scripts use (query / get_table / load_table_from_dataframe /
+insert_rows_json) so they can run unchanged against an embedded database.
+
+`project.dataset.table` references collapse to bare table names and the
+BigQuery-only SQL the scripts use is rewritten to DuckDB equivalents:
+CURRENT_DATE(), DATE(x), DATE_ADD/DATE_SUB/TIMESTAMP_SUB(.., INTERVAL n DAY),
+FARM_FINGERPRINT, SAFE_CAST, UNNEST(arr) AS x and @named parameters.
+LocalBigQueryClient(today=...) pins CURRENT_DATE()/CURRENT_TIMESTAMP() to a
+fixed day so runs against synthetic data don't depend on the wall clock.
+"""
+import re
+from types import SimpleNamespace
+
+try:
+    import duckdb
+except Exception as e:
+    raise SystemExit("DuckDB not installed. pip install duckdb") from e
+
+
+class NotFound(Exception):
+    """Mirrors google.api_core.exceptions.NotFound for table lookups."""
+
+
+_REWRITES = [
+    (re.compile(r"`[\w-]+\.[\w-]+\.(\w+)`"), r"\1"),
+    (re.compile(r"\bCURRENT_DATE\(\)", re.I), "CURRENT_DATE"),
+    (re.compile(r"\bCURRENT_TIMESTAMP\(\)", re.I), "CURRENT_TIMESTAMP"),
+    (re.compile(r"\bDATE\(([^()]+)\)", re.I), r"CAST(\1 AS DATE)"),
+    (re.compile(r"\b(?:DATE|TIMESTAMP)_SUB\(([^(),]+),\s*INTERVAL\s+(\d+)\s+(\w+)\)", re.I),
+     r"(\1 - INTERVAL \2 \3)"),
+    (re.compile(r"\b(?:DATE|TIMESTAMP)_ADD\(([^(),]+),\s*INTERVAL\s+(\d+)\s+(\w+)\)", re.I),
+     r"(\1 + INTERVAL \2 \3)"),
+    (re.compile(r"\bFARM_FINGERPRINT\(", re.I), "hash("),
+    (re.compile(r"\bSAFE_CAST\(", re.I), "TRY_CAST("),
+    (re.compile(r"\bUNNEST\((\w+)\)\s+AS\s+(\w+)", re.I), r"UNNEST(\1) AS _\2(\2)"),
+    (re.compile(r"@(\w+)"), r"$\1"),
+]
+
+
+_CURRENT_DATE = re.compile(r"\bCURRENT_DATE\(\)", re.I)
+_CURRENT_TIMESTAMP = re.compile(r"\bCURRENT_TIMESTAMP\(\)", re.I)
+
+
+def translate(sql: str, today=None) -> str:
+    if today is not None:
+        day = today.strftime("%Y-%m-%d")
+        sql = _CURRENT_DATE.sub(f"DATE '{day}'", sql)
+        sql = _CURRENT_TIMESTAMP.sub(f"TIMESTAMP '{day} 00:00:00'", sql)
+    for pattern, repl in _REWRITES:
+        sql = pattern.sub(repl, sql)
+    return sql
+
+
+def _table_name(ref) -> str:
+    """'p.d.t', DatasetReference.table('t') or a Table-like object -> 't'."""
+    name = getattr(ref, "table_id", None) or str(ref)
+    return name.replace("`", "").split(".")[-1]
+
+
+class _Row(dict):
+    """dict with attribute access, like bigquery.Row."""
+    __getattr__ = dict.__getitem__
+
+
+class LocalQueryJob:
+    def __init__(self, con, sql: str, params: dict, today=None):
+        self._con = con
+        self._sql = translate(sql, today)
+        self._params = params
+        self._cursor = None
+        self.total_bytes_processed = 0
+        self.cache_hit = False
+
+    def _run(self):
+        if self._cursor is None:
+            self._cursor = self._con.execute(self._sql, self._params) if self._params \
+                else self._con.execute(self._sql)
+        return self._cursor
+
+    def result(self):
+        cur = self._run()
+        if cur.description is None:
+            return []
+        cols = [d[0] for d in cur.description]
+        return [_Row(zip(cols, r)) for r in cur.fetchall()]
+
+    def __iter__(self):
+        return iter(self.result())
+
+    def to_dataframe(self, **_):
+        return self._run().df()
+
+
+class LocalBigQueryClient:
+    def __init__(self, path: str = ":memory:", project: str = "local", threads: int = None,
+                 today=None):
+        self.project = project
+        self.today = today
+        self.con = duckdb.connect(path)
+        if threads:
+            self.con.execute(f"SET threads TO {int(threads)}")
+
+    def query(self, sql: str, job_config=None, **_):
+        params = {}
+        for p in getattr(job_config, "query_parameters", None) or []:
+            params[p.name] = p.value
+        job = LocalQueryJob(self.con, sql, params, self.today)
+        job._run()
+        return job
+
+    def get_table(self, ref):
+        name = _table_name(ref)
+        rows = self.con.execute(
+            "SELECT column_name FROM information_schema.columns WHERE table_name = ? ORDER BY ordinal_position",
+            [name]).fetchall()
+        if not rows:
+            raise NotFound(name)
+        num_rows = self.con.execute(f'SELECT COUNT(*) FROM "{name}"').fetchone()[0]
+        return SimpleNamespace(table_id=name, num_rows=num_rows,
+                               schema=[SimpleNamespace(name=r[0]) for r in rows])
+
+    def table_exists(self, name: str) -> bool:
+        try:
+            self.get_table(name)
+            return True
+        except NotFound:
+            return False
+
+    def load_table_from_dataframe(self, df, ref, job_config=None, **_):
+        name = _table_name(ref)
+        disposition = getattr(job_config, "write_disposition", None) or "WRITE_APPEND"
+        self.con.register("_incoming", df)
+        try:
+            if disposition == "WRITE_TRUNCATE" or not self.table_exists(name):
+                self.con.execute(f'CREATE OR REPLACE TABLE "{name}" AS SELECT * FROM _incoming')
+            else:
+                self.con.execute(f'INSERT INTO "{name}" SELECT * FROM _incoming')
+        finally:
+            self.con.unregister("_incoming")
+        return SimpleNamespace(result=lambda: None, output_rows=len(df))
+
+    def insert_rows_json(self, ref, rows):
+        import pandas as pd
+        if rows:
+            self.load_table_from_dataframe(pd.DataFrame(rows), ref)
+        return []
+
+    def load_arrow(self, name: str, table):
+        """Bulk-load a pyarrow Table or DataFrame (used by the synthetic generator)."""
+        self.con.register("_incoming", table)
+        try:
+            self.con.execute(f'CREATE OR REPLACE TABLE "{name}" AS SELECT * FROM _incoming')
+        finally:
+            self.con.unregister("_incoming")
+
+    def close(self):
+        self.con.close()
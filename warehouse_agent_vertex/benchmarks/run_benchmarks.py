@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""Pipeline benchmark suite against a local BigQuery stand-in.
+
+Generates a deterministic synthetic warehouse at the requested scale, loads it
+into DuckDB (benchmarks/local_bq.py) and runs each pipeline stage through the
+real script code, recording per stage:
+  - wall_s          wall-clock seconds
+  - py_peak_mb      peak Python heap during the stage (tracemalloc)
+  - rss_growth_mb   growth of the process high-water RSS during the stage
+  - rows            input rows the stage processed
+  - rows_per_s
+
+Each run is appended to benchmarks/results/results.jsonl with the git commit,
+so `--compare` can flag regressions between versions.
+
+Usage (from warehouse_agent_vertex/):
+  PYTHONPATH="$PWD" python -m benchmarks.run_benchmarks --scale 10k
+  PYTHONPATH="$PWD" python -m benchmarks.run_benchmarks --scale 1k --scale 100k --stages forecast,pricing
+  PYTHONPATH="$PWD" python -m benchmarks.run_benchmarks --compare --threshold 0.15
+
+Requires: duckdb, numpy, pandas (plus the scripts' own imports).
+"""
+import argparse, json, os, platform, resource, subprocess, sys, time, tracemalloc
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS = os.path.join(ROOT, "benchmarks", "results", "results.jsonl")
+for sub in ("", "warehouse_advanced_modules/pricing", "warehouse_advanced_modules/slotting"):
+    sys.path.insert(0, os.path.join(ROOT, sub))
+
+import numpy as np
+
+from benchmarks.local_bq import LocalBigQueryClient
+from benchmarks.synthetic_data import ANCHOR, SCALES, Scale, generate
+
+PROJECT, DATASET = "local", "bench"
+DS = f"{PROJECT}.{DATASET}"
+
+
+# ---- stages -----------------------------------------------------------------
+# Each stage takes the client and returns the number of input rows it processed.
+# Stages run in the order given; pricing reads the inventory_plan built by forecast,
+# cross_sell_index reads the cross_sell_pairs table.
+
+def stage_daily_demand(client):
+    from scripts import forecast_planner
+    forecast_planner.ensure_daily_demand(client, PROJECT, DATASET)
+    return client.get_table(f"{DS}.fact_pick").num_rows
+
+
+def stage_forecast(client):
+    from scripts import forecast_planner
+    forecast_planner.run(client, PROJECT, DATASET, horizon=14, safety_days=7)
+    return client.get_table(f"{DS}.demand_forecast").num_rows
+
+
+def stage_slotting(client):
+    import slotting_optimizer
+    slotting_optimizer.run(client, DS, lookback=30)
+    return client.get_table(f"{DS}.fact_pick").num_rows
+
+
+def stage_pricing(client):
+    import pricing_optimizer
+    args = pricing_optimizer.parse_args(["--project", PROJECT, "--dataset", DATASET])
+    pricing_optimizer.run_scenarios(client, DS, args)
+    return client.get_table(f"{DS}.dim_product").num_rows * args.steps
+
+
+def stage_cross_sell_pairs(client):
+    with open(os.path.join(ROOT, "scripts", "cross_sell_pairs.sql")) as fh:
+        sql = fh.read().replace("{{project}}", PROJECT).replace("{{dataset}}", DATASET)
+    client.query(sql).result()
+    return client.get_table(f"{DS}.picking_logs").num_rows
+
+
+def stage_cross_sell_index(client, probes: int = 2000, basket_size: int = 4):
+    # In-memory CSR index over cross_sell_pairs: build, then single-SKU and basket lookups
+    from scripts.cross_sell_index import CrossSellIndex, load_pairs
+    index = CrossSellIndex.from_frame(load_pairs(client, f"{DS}.cross_sell_pairs"))
+    rng = np.random.default_rng(0)
+    skus = [index.skus[i] for i in rng.integers(0, len(index), probes)]
+    t0 = time.perf_counter()
+    for sku in skus:
+        index.top(sku, 5)
+    t1 = time.perf_counter()
+    for i in range(0, probes, basket_size):
+        index.basket(skus[i:i + basket_size], 5)
+    t2 = time.perf_counter()
+    mem = index.memory_report()
+    print(f"  {'':18} top-5 {(t1 - t0) / probes * 1e6:.1f}us  basket-{basket_size} "
+          f"{(t2 - t1) / (probes // basket_size) * 1e6:.1f}us  {mem['mb_per_million_pairs']} MB/M pairs")
+    return index.n_pairs
+
+
+def stage_hybrid_reco(client, probes: int = 20, top_n: int = 5):
+    # The hybrid tools use BigQuery scripting (DECLARE, UNNEST ... WITH OFFSET),
+    # so this is the same BPR + text-embedding blend in portable SQL.
+    skus = [r["sku"] for r in client.query(
+        f"SELECT sku FROM `{DS}.dim_product` ORDER BY sku LIMIT {probes}").result()]
+    sql = f"""
+    WITH a_bpr AS (SELECT v FROM `{DS}.custom_item_vecs` WHERE sku = @sku),
+         a_emb AS (SELECT v FROM `{DS}.product_text_embeddings` WHERE sku = @sku)
+    SELECT b.sku AS candidate,
+           0.55 * list_cosine_similarity(b.v, (SELECT v FROM a_bpr))
+         + 0.45 * list_cosine_similarity(e.v, (SELECT v FROM a_emb)) AS hybrid_score
+    FROM `{DS}.custom_item_vecs` b
+    JOIN `{DS}.product_text_embeddings` e USING (sku)
+    WHERE b.sku != @sku
+    ORDER BY hybrid_score DESC
+    LIMIT {top_n}
+    """
+    from google.cloud import bigquery
+    for sku in skus:
+        client.query(sql, job_config=bigquery.QueryJobConfig(
+            query_parameters=[bigquery.ScalarQueryParameter("sku", "STRING", sku)])).result()
+    return client.get_table(f"{DS}.custom_item_vecs").num_rows * len(skus)
+
+
+STAGES = {
+    "daily_demand": stage_daily_demand,
+    "forecast": stage_forecast,
+    "slotting": stage_slotting,
+    "pricing": stage_pricing,
+    "cross_sell_pairs": stage_cross_sell_pairs,
+    "cross_sell_index": stage_cross_sell_index,
+    "hybrid_reco": stage_hybrid_reco,
+}
+
+
+# ---- measurement ------------------------------------------------------------
+
+def _maxrss_mb() -> float:
+    kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return kb / (1024 * 1024) if sys.platform == "darwin" else kb / 1024
+
+
+def measure(name, fn, *args):
+    tracemalloc.start()
+    rss0 = _maxrss_mb()
+    t0 = time.perf_counter()
+    rows = fn(*args)
+    wall = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    res = {
+        "stage": name,
+        "wall_s": round(wall, 4),
+        "py_peak_mb": round(peak / 2**20, 2),
+        "rss_growth_mb": round(_maxrss_mb() - rss0, 2),
+        "rows": int(rows),
+        "rows_per_s": round(rows / wall, 1) if wall > 0 else None,
+    }
+    print(f"  {name:18} {wall:9.3f}s {res['py_peak_mb']:9.1f}MB py {res['rss_growth_mb']:9.1f}MB rss "
+          f"{rows:>12,} rows {res['rows_per_s'] or 0:>14,.0f} rows/s")
+    return res
+
+
+def load_dataset(client, scale: Scale, seed: int):
+    tables = generate(scale, seed=seed)
+    total = 0
+    for name, df in tables.items():
+        client.load_arrow(name, df)
+        total += len(df)
+    return total
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def run_scale(label: str, scale: Scale, stages, seed: int, threads: int) -> dict:
+    print(f"\n== scale {label}: {scale.skus:,} SKUs, {scale.days} days ==")
+    client = LocalBigQueryClient(threads=threads, today=ANCHOR)
+    results = [measure("generate+load", load_dataset, client, scale, seed)]
+    for name in stages:
+        results.append(measure(name, STAGES[name], client))
+    client.close()
+    return {
+        "ts": datetime.now(timezone.utc).isoformat(),
+        "commit": git_commit(),
+        "scale": label,
+        "skus": scale.skus,
+        "seed": seed,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "threads": threads,
+        "stages": results,
+    }
+
+
+def save(run: dict, path: str = RESULTS):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a", encoding="utf-8") as fh:
+        fh.write(json.dumps(run) + "\n")
+
+
+def compare(path: str = RESULTS, threshold: float = 0.15) -> int:
+    """Latest run per scale vs the previous run from a different commit. Returns #regressions."""
+    if not os.path.exists(path):
+        print("No results yet.")
+        return 0
+    with open(path, encoding="utf-8") as fh:
+        runs = [json.loads(line) for line in fh if line.strip()]
+
+    regressions = 0
+    for label in sorted({r["scale"] for r in runs}):
+        series = [r for r in runs if r["scale"] == label]
+        latest = series[-1]
+        prev = next((r for r in reversed(series[:-1]) if r["commit"] != latest["commit"]), None)
+        if prev is None:
+            continue
+        print(f"\n== {label}: {prev['commit']} -> {latest['commit']} ==")
+        before = {s["stage"]: s for s in prev["stages"]}
+        for s in latest["stages"]:
+            b = before.get(s["stage"])
+            if not b or not b["wall_s"]:
+                continue
+            delta = s["wall_s"] / b["wall_s"] - 1
+            flag = "REGRESSION" if delta > threshold else ""
+            regressions += bool(flag)
+            print(f"  {s['stage']:18} {b['wall_s']:9.3f}s -> {s['wall_s']:9.3f}s {delta:+7.1%} {flag}")
+    return regressions
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--scale", action="append", choices=sorted(SCALES), help="repeatable; default 1k")
+    ap.add_argument("--skus", type=int, default=None, help="custom SKU count (overrides --scale)")
+    ap.add_argument("--stages", default=",".join(STAGES), help="comma-separated subset of stages")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--threads", type=int, default=None, help="DuckDB threads (default: all cores)")
+    ap.add_argument("--results", default=RESULTS)
+    ap.add_argument("--no-save", action="store_true")
+    ap.add_argument("--compare", action="store_true", help="compare stored runs and exit")
+    ap.add_argument("--threshold", type=float, default=0.15, help="slowdown fraction flagged as regression")
+    args = ap.parse_args()
+
+    if args.compare:
+        raise SystemExit(1 if compare(args.results, args.threshold) else 0)
+
+    stages = [s for s in args.stages.split(",") if s]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        raise SystemExit(f"Unknown stages: {', '.join(sorted(unknown))}")
+
+    plan = ([(f"{args.skus}", Scale(skus=args.skus))] if args.skus
+            else [(s, SCALES[s]) for s in (args.scale or ["1k"])])
+    for label, scale in plan:
+        run = run_scale(label, scale, stages, args.seed, args.threads)
+        if not args.no_save:
+            save(run, args.results)
+    if not args.no_save:
+        print(f"\nResults appended to {args.results}")
+
+
+if __name__ == "__main__":
+    main()
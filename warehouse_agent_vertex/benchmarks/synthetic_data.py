@@ -0,0 +1,143 @@
+"""Deterministic synthetic warehouse data.
+
+generate(scale) returns pandas DataFrames for the tables the pipeline reads:
+dim_product, dim_location, fact_pick, fact_stock_snapshot, demand_forecast,
+picking_logs (legacy name used by cross_sell_pairs.sql), product_text_embeddings,
+product_embeddings and custom_item_vecs.
+
+Everything is drawn from a single seeded numpy Generator and dated back from
+a fixed ANCHOR day, so a given (scale, seed) always produces identical tables. Demand is long-tailed
+(a few SKUs get most picks) so velocity ranking and cross-sell pairs look
+like a real warehouse rather than uniform noise.
+"""
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+
+@dataclass(frozen=True)
+class Scale:
+    skus: int
+    days: int = 90
+    picks_per_sku_day: float = 0.4
+    lines_per_order: float = 3.0
+    locations_per_10_skus: int = 1
+    embed_dim: int = 32
+
+
+SCALES = {
+    "1k": Scale(skus=1_000),
+    "10k": Scale(skus=10_000),
+    "100k": Scale(skus=100_000),
+    "1m": Scale(skus=1_000_000, picks_per_sku_day=0.1, embed_dim=16),
+}
+
+CATEGORIES = np.array(["grocery", "beverage", "household", "personal care", "pet", "baby", "hardware"])
+BRANDS = np.array([f"brand{i:02d}" for i in range(40)])
+SIZES = np.array(["S", "M", "L", "XL", "6-pack", "12-pack"])
+FUNCTIONS = np.array(["cleaning", "snack", "drink", "storage", "care", "tool", "food"])
+
+# "Today" for the synthetic warehouse; LocalBigQueryClient(today=ANCHOR) pins
+# CURRENT_DATE() to it so the pipeline's date windows cover the generated data.
+ANCHOR = datetime(2025, 7, 1, tzinfo=timezone.utc)
+
+
+def sku_ids(n: int) -> np.ndarray:
+    return np.char.add("SKU", np.char.zfill(np.arange(n).astype(str), 7))
+
+
+def _embeddings(rng, n, dim):
+    v = rng.standard_normal((n, dim)).astype(np.float64)
+    norm = np.linalg.norm(v, axis=1) + 1e-9
+    return v.tolist(), norm
+
+
+def generate(scale: Scale, seed: int = 42, today: datetime = None) -> dict:
+    rng = np.random.default_rng(seed)
+    today = (today or ANCHOR).replace(hour=0, minute=0, second=0, microsecond=0)
+    n = scale.skus
+    skus = sku_ids(n)
+
+    # --- dimensions ----------------------------------------------------------
+    cat = rng.integers(0, len(CATEGORIES), n)
+    price = np.round(rng.lognormal(2.3, 0.7, n), 2)
+    dim_product = pd.DataFrame({
+        "sku": skus,
+        "description": np.char.add("item ", skus),
+        "category": CATEGORIES[cat],
+        "brand": BRANDS[rng.integers(0, len(BRANDS), n)],
+        "size": SIZES[rng.integers(0, len(SIZES), n)],
+        "product_function": FUNCTIONS[cat % len(FUNCTIONS)],
+        "current_price": price,
+        "unit_cost": np.round(price * rng.uniform(0.45, 0.75, n), 2),
+    })
+
+    n_loc = max(10, n * scale.locations_per_10_skus // 10)
+    loc_ids = np.char.add("LOC", np.char.zfill(np.arange(n_loc).astype(str), 6))
+    dim_location = pd.DataFrame({
+        "location_id": loc_ids,
+        "travel_cost": np.round(rng.gamma(2.0, 10.0, n_loc), 3),
+    })
+
+    # --- picks: Zipf-like popularity, grouped into orders -------------------
+    popularity = 1.0 / np.arange(1, n + 1) ** 0.9
+    popularity = rng.permutation(popularity / popularity.sum())
+    n_picks = int(n * scale.days * scale.picks_per_sku_day)
+    pick_sku = rng.choice(n, size=n_picks, p=popularity)
+    n_orders = max(1, int(n_picks / scale.lines_per_order))
+    order_idx = rng.integers(0, n_orders, n_picks)
+    # Co-locate order lines in time: each order has one timestamp
+    order_ts = rng.integers(0, scale.days * 86400, n_orders)
+    start = today - timedelta(days=scale.days)
+    home_loc = rng.integers(0, n_loc, n)  # pick face per SKU
+    fact_pick = pd.DataFrame({
+        "event_ts": pd.to_datetime(start) + pd.to_timedelta(order_ts[order_idx], unit="s"),
+        "order_id": np.char.add("ORD", order_idx.astype(str)),
+        "sku": skus[pick_sku],
+        "qty": rng.integers(1, 5, n_picks),
+        "location_id": loc_ids[home_loc[pick_sku]],
+        "staff": np.char.add("picker", (order_idx % 50).astype(str)),
+    })
+
+    # --- stock: 1-3 locations per SKU -----------------------------------------
+    daily_rate = popularity * n_picks / scale.days * 2.5  # units/day (mean qty 2.5)
+    locs_per_sku = rng.integers(1, 4, n)
+    stock_sku = np.repeat(np.arange(n), locs_per_sku)
+    stock_loc = np.where(
+        np.concatenate([[True], stock_sku[1:] != stock_sku[:-1]]),
+        home_loc[stock_sku], rng.integers(0, n_loc, len(stock_sku)))
+    cover_days = rng.gamma(2.0, 12.0, len(stock_sku)) / locs_per_sku[stock_sku]
+    fact_stock_snapshot = pd.DataFrame({
+        "snapshot_ts": pd.Timestamp(today),
+        "sku": skus[stock_sku],
+        "location_id": loc_ids[stock_loc],
+        "on_hand": np.ceil(daily_rate[stock_sku] * cover_days).astype(np.int64),
+    })
+
+    # --- 30-day forecast ------------------------------------------------------
+    horizon = 30
+    fc_dates = pd.date_range(pd.Timestamp(today.date()), periods=horizon, freq="D")
+    noise = rng.normal(1.0, 0.15, (n, horizon)).clip(0.2)
+    demand_forecast = pd.DataFrame({
+        "date": np.tile(fc_dates.date, n),
+        "sku": np.repeat(skus, horizon),
+        "predicted_demand": (daily_rate[:, None] * noise).ravel(),
+    })
+
+    # --- embeddings -----------------------------------------------------------
+    text_v, text_norm = _embeddings(rng, n, scale.embed_dim)
+    bpr_v, bpr_norm = _embeddings(rng, n, scale.embed_dim)
+
+    return {
+        "dim_product": dim_product,
+        "dim_location": dim_location,
+        "fact_pick": fact_pick,
+        "picking_logs": fact_pick[["order_id", "sku"]],
+        "fact_stock_snapshot": fact_stock_snapshot,
+        "demand_forecast": demand_forecast,
+        "product_text_embeddings": pd.DataFrame({"sku": skus, "v": text_v, "norm": text_norm}),
+        "product_embeddings": pd.DataFrame({"sku": skus, "emb": text_v, "norm": text_norm}),
+        "custom_item_vecs": pd.DataFrame({"sku": skus, "v": bpr_v, "norm": bpr_norm}),
+    }
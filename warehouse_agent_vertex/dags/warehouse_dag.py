@@ -1,33 +1,182 @@
+"""Nightly warehouse pipeline.
+
+etl_to_bq
+  -> gate_forecast -> daily_demand -> forecast_shard_<i> -> plan_shard_<i> -> merge_shards
+                                                                    -> gate_pricing -> pricing
+  -> gate_pairs -> build_cross_sell_pairs
+  -> gate_embeddings -> product_text_embeddings, product_embeddings -> record_embeddings
+  -> gate_slotting -> slotting
+
+Forecast and planning fan out over FORECAST_SHARDS SKU hash shards, so the
+critical path is the slowest shard rather than the whole catalogue. Planning
+reuses the existing demand_forecast (naive fallback), as forecast_planner does
+by default. Only with the Airflow Variable prefer_bqml=true do daily_demand and
+forecast_shard_<i> retrain the per-shard ARIMA_PLUS models and merge_shards
+rebuild demand_forecast; otherwise those tasks do nothing. Each gate
+fingerprints its stage's input tables (scripts/pipeline_state.py) and skips the
+stage when they are unchanged since its last success. Trigger with
+{"force": true} in the run conf to run every stage.
+
+Airflow Variables: gcp_project, bq_dataset (default "warehouse"), prefer_bqml (default false).
+"""
 from airflow import DAG
-from airflow.operators.python import PythonOperator
-from airflow.providers.google.cloud.operators.bigquery import BigQueryInsertJobOperator
+from airflow.models import Variable
+from airflow.operators.python import PythonOperator, ShortCircuitOperator
 from datetime import datetime
-from scripts import etl_bq, forecast_planner
+from scripts.config import config
+
+SHARDS = config.FORECAST_SHARDS
+
+# Input tables per stage; a stage reruns only when one of these changes
+STAGE_INPUTS = {
+    "forecast": ["fact_pick", "fact_stock_snapshot"],
+    "pairs": ["picking_logs"],
+    "embeddings": ["dim_product"],
+    "slotting": ["fact_pick", "fact_stock_snapshot", "dim_location"],
+    "pricing": ["dim_product", "inventory_plan", "demand_forecast", "price_history", "fact_pick"],
+}
 
 default_args = {'start_date': datetime(2025, 7, 1)}
 
-with DAG('warehouse_etl', default_args=default_args, schedule_interval='@daily', catchup=False) as dag:
-
-    etl_task = PythonOperator(
-        task_id='etl_to_bq',
-        python_callable=etl_bq.main
-    )
-
-    forecast_task = PythonOperator(
-        task_id='forecast_to_bq',
-        python_callable=forecast_planner.main
-    )
-
-    build_pairs = BigQueryInsertJobOperator(
-        task_id='build_cross_sell_pairs',
-        configuration={
-            'query': {
-                'query': open('scripts/cross_sell_pairs.sql').read()
-                          .replace('{{project}}','{{ var.value.gcp_project }}')
-                          .replace('{{dataset}}','warehouse'),
-                'useLegacySql': False
-            }
-        }
-    )
-
-    etl_task >> forecast_task >> build_pairs
+def _target():
+    project = Variable.get("gcp_project", default_var=config.GCP_PROJECT_ID)
+    return project, Variable.get("bq_dataset", default_var="warehouse")
+
+def _prefer_bqml() -> bool:
+    return Variable.get("prefer_bqml", default_var="false").lower() in ("1", "true", "yes")
+
+def _client(project):
+    from google.cloud import bigquery
+    from scripts.instrumentation import init_tracing
+    init_tracing()
+    return bigquery.Client(project=project)
+
+def _state_key(stage):
+    return f"warehouse_state__{stage}"
+
+def gate(stage, **context):
+    """Push the stage's input fingerprint; False (skip) if it matches the last success."""
+    from scripts.pipeline_state import input_fingerprint
+    project, dataset = _target()
+    fingerprint = input_fingerprint(_client(project), project, dataset, STAGE_INPUTS[stage])
+    context["ti"].xcom_push(key="fingerprint", value=fingerprint)
+    if (context["dag_run"].conf or {}).get("force"):
+        return True
+    return fingerprint != Variable.get(_state_key(stage), default_var=None)
+
+def record(stage, context):
+    """Store the fingerprint seen by the stage's gate once the stage has succeeded."""
+    fingerprint = context["ti"].xcom_pull(task_ids=f"gate_{stage}", key="fingerprint")
+    if fingerprint:
+        Variable.set(_state_key(stage), fingerprint)
+
+# ---- stages -----------------------------------------------------------------
+
+def run_etl():
+    from scripts import etl_bq
+    etl_bq.main()
+
+def run_daily_demand():
+    if not _prefer_bqml():
+        return
+    from scripts import forecast_planner
+    project, dataset = _target()
+    forecast_planner.ensure_daily_demand(_client(project), project, dataset)
+
+def run_forecast_shard(index, horizon=14):
+    if not _prefer_bqml():
+        return  # planning reads demand_forecast as is
+    from scripts import forecast_planner
+    project, dataset = _target()
+    forecast_planner.ensure_bqml_forecast(_client(project), project, dataset, horizon,
+                                          shard=(index, SHARDS), refresh_daily=False)
+
+def run_plan_shard(index, horizon=14, safety_days=7):
+    from scripts import forecast_planner
+    project, dataset = _target()
+    forecast_planner.run(_client(project), project, dataset, horizon, safety_days,
+                         prefer_bqml=_prefer_bqml(), shard=(index, SHARDS), refresh_daily=False)
+
+def run_merge_shards(**context):
+    from scripts import forecast_planner
+    project, dataset = _target()
+    client = _client(project)
+    bases = ("demand_forecast", "inventory_plan") if _prefer_bqml() else ("inventory_plan",)
+    for base in bases:
+        forecast_planner.merge_shards(client, project, dataset, base, SHARDS)
+    record("forecast", context)
+
+def run_pairs(**context):
+    project, dataset = _target()
+    with open('scripts/cross_sell_pairs.sql') as fh:
+        sql = fh.read().replace('{{project}}', project).replace('{{dataset}}', dataset)
+    _client(project).query(sql).result()
+    record("pairs", context)
+
+def run_text_embeddings():
+    from scripts import product_text_embeddings_vertex
+    project, dataset = _target()
+    product_text_embeddings_vertex.main(["--project", project, "--dataset", dataset])
+
+def run_product_embeddings():
+    from scripts import vertex_build_embeddings
+    project, dataset = _target()
+    vertex_build_embeddings.main(["--project", project, "--dataset", dataset])
+
+def run_record(stage, **context):
+    record(stage, context)
+
+def run_slotting(**context):
+    from scripts import slotting_optimizer
+    project, dataset = _target()
+    slotting_optimizer.run(_client(project), f"{project}.{dataset}")
+    record("slotting", context)
+
+def run_pricing(**context):
+    from scripts import pricing_optimizer
+    project, dataset = _target()
+    args = pricing_optimizer.parse_args(["--project", project, "--dataset", dataset])
+    pricing_optimizer.run_scenarios(_client(project), f"{project}.{dataset}", args)
+    record("pricing", context)
+
+
+with DAG('warehouse_etl', default_args=default_args, schedule_interval='@daily', catchup=False,
+         max_active_tasks=max(16, SHARDS * 2)) as dag:
+
+    # Gates run even if an upstream stage was skipped, and skip only their own stage
+    gates = {
+        stage: ShortCircuitOperator(
+            task_id=f"gate_{stage}",
+            python_callable=gate,
+            op_kwargs={"stage": stage},
+            ignore_downstream_trigger_rules=False,
+            trigger_rule="none_failed",
+        )
+        for stage in STAGE_INPUTS
+    }
+
+    etl_task = PythonOperator(task_id='etl_to_bq', python_callable=run_etl)
+
+    daily_demand = PythonOperator(task_id='daily_demand', python_callable=run_daily_demand)
+    merge = PythonOperator(task_id='merge_shards', python_callable=run_merge_shards)
+    for i in range(SHARDS):
+        forecast = PythonOperator(task_id=f'forecast_shard_{i}', python_callable=run_forecast_shard,
+                                  op_kwargs={"index": i})
+        plan = PythonOperator(task_id=f'plan_shard_{i}', python_callable=run_plan_shard,
+                              op_kwargs={"index": i})
+        daily_demand >> forecast >> plan >> merge
+
+    build_pairs = PythonOperator(task_id='build_cross_sell_pairs', python_callable=run_pairs)
+    text_embeddings = PythonOperator(task_id='product_text_embeddings', python_callable=run_text_embeddings)
+    product_embeddings = PythonOperator(task_id='product_embeddings', python_callable=run_product_embeddings)
+    embeddings_done = PythonOperator(task_id='record_embeddings', python_callable=run_record,
+                                     op_kwargs={"stage": "embeddings"})
+    slotting = PythonOperator(task_id='slotting', python_callable=run_slotting)
+    pricing = PythonOperator(task_id='pricing', python_callable=run_pricing)
+
+    etl_task >> [gates["forecast"], gates["pairs"], gates["embeddings"], gates["slotting"]]
+    gates["forecast"] >> daily_demand
+    gates["pairs"] >> build_pairs
+    gates["embeddings"] >> [text_embeddings, product_embeddings] >> embeddings_done
+    gates["slotting"] >> slotting
+    merge >> gates["pricing"] >> pricing
@@ -18,5 +18,36 @@ class Config:
 
     # Agent params
     MAX_AUTO_RESTOCK = int(os.getenv("MAX_AUTO_RESTOCK", "100"))
+    AGENT_MODE        = os.getenv("AGENT_MODE", "react")   # react | parallel (scripts/parallel_agent.py)
+    AGENT_MAX_STEPS   = int(os.getenv("AGENT_MAX_STEPS", "8"))
+    TOOL_POOL_WORKERS = int(os.getenv("TOOL_POOL_WORKERS", "16"))
+    TOOL_CONCURRENCY  = os.getenv("TOOL_CONCURRENCY", "sql_db_query=4,VertexHybridCrossSell=2,HybridVertexCrossSell=2")
+    # Hybrid recommender tools from vertex_hybrid_reco_bundle to add to the agent, e.g.
+    # "VertexHybridCrossSell,HybridVertexCrossSell"; they need the embedding/BPR tables built first
+    HYBRID_TOOLS      = os.getenv("HYBRID_TOOLS", "")
+    # Tool output compaction and per-run prompt budget (scripts/tool_compaction.py)
+    AGENT_TOKEN_BUDGET = int(os.getenv("AGENT_TOKEN_BUDGET", "60000"))   # prompt tokens per question
+    TOOL_OUTPUT_TOKENS = int(os.getenv("TOOL_OUTPUT_TOKENS", "800"))     # max tokens one tool result adds
+    TOOL_STORE_MAX     = int(os.getenv("TOOL_STORE_MAX", "64"))          # full results kept for ResultPage
+
+    # Nightly DAG: forecast/plan fan-out across SKU hash shards
+    FORECAST_SHARDS = int(os.getenv("FORECAST_SHARDS", "8"))
+
+    # Cross-sell index (scripts/cross_sell_index.py)
+    CROSS_SELL_INDEX_TTL = int(os.getenv("CROSS_SELL_INDEX_TTL", "3600"))  # seconds; 0 = never refresh
+    CROSS_SELL_MIN_COUNT = int(os.getenv("CROSS_SELL_MIN_COUNT", "1"))     # raise to drop rare pairs
+
+    # Fast-path intent router in front of the agent (scripts/intent_router.py)
+    ROUTER_ENABLED     = os.getenv("ROUTER_ENABLED", "1").lower() in ("1", "true", "yes")
+    ROUTER_CACHE_TTL   = int(os.getenv("ROUTER_CACHE_TTL", "300"))   # seconds
+    # "SKU 100049" (id captured after SKU), SKU1 / sku-7, or AB-1234 style ids
+    ROUTER_SKU_PATTERN = os.getenv(
+        "ROUTER_SKU_PATTERN",
+        r"\b(?i:sku)[ #:]+([A-Za-z]*\d[\w-]*)|\b((?i:sku)[-_]?\d[\w-]*|[A-Za-z]{1,6}[-_]?\d{2,}[A-Za-z0-9-]*)\b")
+
+    # Tracing (scripts/instrumentation.py)
+    TRACE_ENABLED = os.getenv("WAREHOUSE_TRACE", "0").lower() in ("1", "true", "yes")
+    TRACE_PATH    = os.getenv("WAREHOUSE_TRACE_PATH", "traces.jsonl")
+    METRICS_PORT  = int(os.getenv("WAREHOUSE_METRICS_PORT", "0"))
 
 config = Config()
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""In-memory cross-sell graph built from cross_sell_pairs.
+
+The pair table is loaded once into CSR arrays:
+  indptr[n+1]   row offsets per SKU id
+  neighbors[2P] neighbor SKU ids, each row sorted by co-occurrence count desc
+  counts[2P]    co-occurrence counts
+SKU strings are interned once; everything else is int32/int64. A single-SKU
+top-N is an array slice. Basket mode sums each candidate's (row-normalised)
+score across the basket and drops SKUs already in it.
+
+get_index() loads lazily and, once the index is older than
+CROSS_SELL_INDEX_TTL seconds, rebuilds it in a background thread and swaps it
+in with one assignment. Readers never see a partly built index.
+
+Usage:
+  python -m scripts.cross_sell_index --sku SKU0000042
+  python -m scripts.cross_sell_index --basket SKU0000042,SKU0000007 --top-n 10
+  python -m scripts.cross_sell_index --report
+"""
+import argparse, sys, threading, time
+import numpy as np
+import pandas as pd
+from google.cloud import bigquery
+from scripts.config import config
+
+class CrossSellIndex:
+    def __init__(self, skus, indptr, neighbors, counts):
+        self.skus = skus                                  # id -> interned SKU string
+        self.ids = {s: i for i, s in enumerate(skus)}     # SKU string -> id
+        self.indptr = indptr
+        self.neighbors = neighbors
+        self.counts = counts
+        self.row_total = np.add.reduceat(counts, indptr[:-1]).astype(np.float64) if len(counts) \
+            else np.zeros(len(skus))
+        self.loaded_at = time.time()
+
+    @classmethod
+    def from_pairs(cls, sku_a, sku_b, counts) -> "CrossSellIndex":
+        """Build from parallel arrays of an undirected pair list (sku_a, sku_b, count)."""
+        counts = np.asarray(counts, dtype=np.int64)
+        n_pairs = len(counts)
+        codes, names = pd.factorize(np.concatenate([np.asarray(sku_a, dtype=object),
+                                                    np.asarray(sku_b, dtype=object)]), sort=True)
+        a, b = codes[:n_pairs], codes[n_pairs:]
+        src = np.concatenate([a, b])
+        dst = np.concatenate([b, a])
+        cnt = np.concatenate([counts, counts])
+        order = np.lexsort((dst, -cnt, src))   # by row, then count desc, then id for stable ties
+        n = len(names)
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=n), out=indptr[1:])
+        skus = [sys.intern(str(s)) for s in names]
+        return cls(skus, indptr, dst[order].astype(np.int32), cnt[order].astype(np.int32))
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "CrossSellIndex":
+        return cls.from_pairs(df["sku_a"].to_numpy(), df["sku_b"].to_numpy(), df["n"].to_numpy())
+
+    def __len__(self):
+        return len(self.skus)
+
+    @property
+    def n_pairs(self) -> int:
+        return len(self.neighbors) // 2
+
+    def top(self, sku: str, top_n: int = 3):
+        """[(sku, count)] most often picked together with `sku`."""
+        i = self.ids.get(sku)
+        if i is None:
+            return []
+        lo = self.indptr[i]
+        hi = min(self.indptr[i + 1], lo + top_n)
+        return [(self.skus[j], int(c)) for j, c in zip(self.neighbors[lo:hi].tolist(),
+                                                        self.counts[lo:hi].tolist())]
+
+    def basket(self, skus, top_n: int = 5, normalize: bool = True, per_item: int = None):
+        """[(sku, score)] for a basket, excluding SKUs already in it.
+
+        normalize=True scores each neighbor by count / row total (roughly
+        P(candidate | basket item)), so one very popular item doesn't swamp
+        the rest. per_item caps how many neighbors each item contributes.
+        """
+        rows = [self.ids[s] for s in dict.fromkeys(skus) if s in self.ids]
+        if not rows:
+            return []
+        nb_parts, sc_parts = [], []
+        for r in rows:
+            lo, hi = self.indptr[r], self.indptr[r + 1]
+            if per_item:
+                hi = min(hi, lo + per_item)
+            nb_parts.append(self.neighbors[lo:hi])
+            sc = self.counts[lo:hi].astype(np.float64)
+            sc_parts.append(sc / self.row_total[r] if normalize else sc)
+        nb = np.concatenate(nb_parts)
+        sc = np.concatenate(sc_parts)
+        if not len(nb):
+            return []
+
+        order = np.argsort(nb, kind="stable")
+        nb, sc = nb[order], sc[order]
+        starts = np.flatnonzero(np.r_[True, nb[1:] != nb[:-1]])
+        cand, score = nb[starts], np.add.reduceat(sc, starts)
+
+        keep = ~np.isin(cand, rows)
+        cand, score = cand[keep], score[keep]
+        k = min(top_n, len(cand))
+        if k == 0:
+            return []
+        best = np.argpartition(-score, k - 1)[:k] if k < len(cand) else np.arange(len(cand))
+        best = best[np.argsort(-score[best], kind="stable")]
+        return [(self.skus[j], float(s)) for j, s in zip(cand[best].tolist(), score[best].tolist())]
+
+    def memory_report(self) -> dict:
+        csr = self.indptr.nbytes + self.neighbors.nbytes + self.counts.nbytes + self.row_total.nbytes
+        strings = sum(map(sys.getsizeof, self.skus)) + sys.getsizeof(self.skus) + sys.getsizeof(self.ids)
+        total = csr + strings
+        return {
+            "skus": len(self.skus),
+            "pairs": self.n_pairs,
+            "csr_bytes": csr,
+            "string_bytes": strings,
+            "total_bytes": total,
+            "mb_per_million_pairs": round(total / 2**20 / (self.n_pairs / 1e6), 2) if self.n_pairs else None,
+        }
+
+# ---- loading and hot swap ---------------------------------------------------
+
+def load_pairs(client, table_id: str, min_count: int = 1) -> pd.DataFrame:
+    # cross_sell_pairs.sql writes pair_count; older tables used pair_orders
+    cols = {f.name for f in client.get_table(table_id).schema}
+    count_col = "pair_count" if "pair_count" in cols else "pair_orders"
+    return client.query(f"""
+      SELECT sku_a, sku_b, {count_col} AS n
+      FROM `{table_id}`
+      WHERE {count_col} >= {int(min_count)}
+    """).to_dataframe(create_bqstorage_client=True)
+
+_index = None
+_lock = threading.Lock()
+
+def _table_id():
+    return f"{config.GCP_PROJECT_ID}.{config.BQ_DATASET}.cross_sell_pairs"
+
+def refresh_index(client=None, table_id: str = None) -> CrossSellIndex:
+    """Rebuild from BigQuery and swap it in; lookups keep using the old index meanwhile."""
+    global _index
+    client = client or bigquery.Client(project=config.GCP_PROJECT_ID)
+    index = CrossSellIndex.from_frame(load_pairs(client, table_id or _table_id(),
+                                                 config.CROSS_SELL_MIN_COUNT))
+    _index = index
+    return index
+
+def _refresh_in_background():
+    if not _lock.acquire(blocking=False):
+        return  # a refresh is already running
+
+    def work():
+        try:
+            refresh_index()
+        except Exception as e:
+            print(f"cross-sell index refresh failed, keeping previous index: {e}")
+        finally:
+            _lock.release()
+
+    threading.Thread(target=work, name="cross-sell-refresh", daemon=True).start()
+
+def get_index() -> CrossSellIndex:
+    index = _index
+    if index is None:
+        with _lock:
+            if _index is None:
+                refresh_index()
+        return _index
+    ttl = config.CROSS_SELL_INDEX_TTL
+    if ttl and time.time() - index.loaded_at > ttl:
+        _refresh_in_background()
+    return index
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sku", default=None)
+    ap.add_argument("--basket", default=None, help="comma-separated SKUs")
+    ap.add_argument("--top-n", type=int, default=5)
+    ap.add_argument("--report", action="store_true", help="print memory footprint")
+    args = ap.parse_args(argv)
+
+    t0 = time.perf_counter()
+    index = refresh_index()
+    print(f"Loaded {index.n_pairs:,} pairs / {len(index):,} SKUs in {time.perf_counter() - t0:.2f}s")
+    if args.report:
+        for k, v in index.memory_report().items():
+            print(f"  {k:22} {v:,}" if isinstance(v, int) else f"  {k:22} {v}")
+    if args.sku:
+        print(index.top(args.sku, args.top_n))
+    if args.basket:
+        print(index.basket([s.strip() for s in args.basket.split(",") if s.strip()], args.top_n))
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,8 @@
 import pandas as pd
 from google.cloud import bigquery
 from scripts.config import config
+from scripts.instrumentation import init_tracing
+from scripts.schema_manager import is_view
 
 client = bigquery.Client(project=config.GCP_PROJECT_ID)
 dataset_ref = bigquery.DatasetReference(config.GCP_PROJECT_ID, config.BQ_DATASET)
@@ -13,6 +15,7 @@ def load_df(df: pd.DataFrame, table_name: str, write_disposition="WRITE_TRUNCATE
     print(f"Loaded {len(df)} rows into {table_name}")
 
 def main():
+    init_tracing()
     # Extract
     products_df  = pd.read_csv("data/products.csv")
     stock_df     = pd.read_csv("data/stock_levels.csv")
@@ -30,6 +33,9 @@ def main():
                      ("receiving_logs", receiving_df),
                      ("picking_logs", picks_df),
                      ("daily_demand", daily_demand)]:
+        if is_view(client, f"{config.GCP_PROJECT_ID}.{config.BQ_DATASET}.{name}"):
+            print(f"Skipping {name}: managed view (scripts/schema_manager.py)")
+            continue
         load_df(df, name)
 
     print("ETL complete.")
@@ -6,10 +6,16 @@ Forecast Planner (standalone)
 - Otherwise builds a naive forecast (avg of last 30 days of fact_pick).
 - Optional: --prefer-bqml trains ARIMA_PLUS (BQML) and materializes demand_forecast.
 - Produces inventory_plan with recommended_order_qty and stockout ETA.
+- Optional: --shard-index/--shard-count restrict the run to one SKU hash shard
+  (reads that shard's rows of demand_forecast, writes inventory_plan__shard_<i>;
+  with --prefer-bqml it reads/trains demand_forecast__shard_<i> instead);
+  --merge-shards N unions the shard tables back into inventory_plan.
 
 Usage:
   python forecast_planner.py --horizon 14 --safety-days 7 \
     --project $GCP_PROJECT_ID --dataset $BQ_DATASET
+  python forecast_planner.py --prefer-bqml --shard-index 3 --shard-count 8
+  python forecast_planner.py --merge-shards 8
 
 Auth:
   Use Application Default Credentials (ADC). For local dev either:
@@ -20,12 +26,18 @@ import argparse, math, os
 from datetime import date, timedelta
 import pandas as pd
 from google.cloud import bigquery
-from google.cloud import bigquery
 from google.oauth2 import service_account
+from scripts.instrumentation import init_tracing
+from scripts.schema_manager import ensure_table, is_view, table_clauses
+
+# Service-account key used when present; otherwise fall back to ADC.
+SA_PATH = os.getenv("GCP_SA_KEY_PATH", "/Users/ajay/project/alpine-alpha-467613-k9-708aeb6f2f6b.json")
+
+def load_credentials():
+    if SA_PATH and os.path.exists(SA_PATH):
+        return service_account.Credentials.from_service_account_file(SA_PATH)
+    return None
 
-# add near the top of main(), before creating the client:
-SA_PATH = "/Users/ajay/project/alpine-alpha-467613-k9-708aeb6f2f6b.json"
-CREDS = service_account.Credentials.from_service_account_file(SA_PATH)
 def table_exists(client: bigquery.Client, project: str, dataset: str, table: str) -> bool:
     try:
         client.get_table(f"{project}.{dataset}.{table}")
@@ -43,8 +55,32 @@ def load_df(client: bigquery.Client, df: pd.DataFrame, table_ref: str, write_dis
     )
     job.result()
 
+def shard_filter(shard, col="sku") -> str:
+    """SQL predicate for one SKU hash shard; shard is (index, count) or None."""
+    if not shard:
+        return "TRUE"
+    index, count = shard
+    return f"MOD(ABS(FARM_FINGERPRINT({col})), {count}) = {index}"
+
+def shard_table(base: str, shard) -> str:
+    return f"{base}__shard_{shard[0]}" if shard else base
+
+def merge_shards(client, project, dataset, base, shard_count):
+    # Union <base>__shard_0..N-1 into <base>; ignores stale shards from a larger N
+    clauses = table_clauses(base)
+    if clauses:
+        ensure_table(client, f"{project}.{dataset}", base)
+    sql = f"""
+    CREATE OR REPLACE TABLE `{project}.{dataset}.{base}` {clauses} AS
+    SELECT * FROM `{project}.{dataset}.{base}__shard_*`
+    WHERE SAFE_CAST(_TABLE_SUFFIX AS INT64) < {shard_count}
+    """
+    client.query(sql).result()
+
 def ensure_daily_demand(client, project, dataset):
     # Build daily_demand from fact_pick (last 180 days for speed; adjust as needed)
+    if is_view(client, f"{project}.{dataset}.daily_demand"):
+        return  # materialized view (scripts/schema_manager.py), refreshed incrementally
     sql = f"""
     CREATE OR REPLACE TABLE `{project}.{dataset}.daily_demand` AS
     SELECT DATE(event_ts) AS date, sku, SUM(qty) AS picks
@@ -54,11 +90,13 @@ def ensure_daily_demand(client, project, dataset):
     """
     client.query(sql).result()
 
-def ensure_bqml_forecast(client, project, dataset, horizon):
+def ensure_bqml_forecast(client, project, dataset, horizon, shard=None, refresh_daily=True):
     # Train multi-series ARIMA_PLUS and write demand_forecast (date, sku, predicted_demand)
-    ensure_daily_demand(client, project, dataset)
+    if refresh_daily:
+        ensure_daily_demand(client, project, dataset)
+    model = f"demand_arima_shard_{shard[0]}" if shard else "demand_arima_all"
     train_sql = f"""
-    CREATE OR REPLACE MODEL `{project}.{dataset}.demand_arima_all`
+    CREATE OR REPLACE MODEL `{project}.{dataset}.{model}`
     OPTIONS(
       MODEL_TYPE='ARIMA_PLUS',
       TIME_SERIES_TIMESTAMP_COL='date',
@@ -70,65 +108,65 @@ def ensure_bqml_forecast(client, project, dataset, horizon):
     SELECT date, sku, picks
     FROM `{project}.{dataset}.daily_demand`
     WHERE date < CURRENT_DATE()
+      AND date >= DATE_SUB(CURRENT_DATE(), INTERVAL 180 DAY)
+      AND {shard_filter(shard)}
     ORDER BY date;
     """
     client.query(train_sql).result()
+    clauses = "" if shard else table_clauses("demand_forecast")
+    if clauses:
+        ensure_table(client, f"{project}.{dataset}", "demand_forecast")
     fc_sql = f"""
-    CREATE OR REPLACE TABLE `{project}.{dataset}.demand_forecast` AS
+    CREATE OR REPLACE TABLE `{project}.{dataset}.{shard_table("demand_forecast", shard)}` {clauses} AS
     SELECT
       CAST(forecast_timestamp AS DATE) AS date,
       sku,
       forecast_value AS predicted_demand
-    FROM ML.FORECAST(MODEL `{project}.{dataset}.demand_arima_all`, STRUCT({horizon} AS horizon));
+    FROM ML.FORECAST(MODEL `{project}.{dataset}.{model}`, STRUCT({horizon} AS horizon));
     """
     client.query(fc_sql).result()
 
-def main():
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--project", default=os.getenv("GCP_PROJECT_ID"), help="GCP project ID")
-    parser.add_argument("--dataset", default=os.getenv("BQ_DATASET", "warehouse"), help="BigQuery dataset")
-    parser.add_argument("--horizon", type=int, default=int(os.getenv("HORIZON_DAYS", 14)), help="Forecast horizon days")
-    parser.add_argument("--safety-days", type=int, default=int(os.getenv("SAFETY_DAYS", 7)), dest="safety_days", help="Safety stock days")
-    parser.add_argument("--prefer-bqml", action="store_true", help="If no demand_forecast data for horizon, train BQML ARIMA and use it")
-    args = parser.parse_args()
-
-    if not args.project:
-        raise SystemExit("Project ID not set. Use --project or export GCP_PROJECT_ID.")
-
-    client = bigquery.Client(project=args.project, credentials=CREDS)
-
-    # Try to read an existing demand_forecast covering the horizon
-    have_forecast = table_exists(client, args.project, args.dataset, "demand_forecast")
+def run(client: bigquery.Client, project: str, dataset: str, horizon: int = 14,
+        safety_days: int = 7, prefer_bqml: bool = False, shard=None, refresh_daily: bool = True):
+    """Build inventory_plan (or one shard of it) with an existing client (no argv parsing)."""
+    fc_table = shard_table("demand_forecast", shard)
+    where_shard = shard_filter(shard)
+    # Try to read an existing forecast covering the horizon: the shard's own BQML
+    # table when training per shard, otherwise the shard's rows of demand_forecast
+    sources = [fc_table, "demand_forecast"] if shard and prefer_bqml else ["demand_forecast"]
     fc = pd.DataFrame()
-    if have_forecast:
-        fc = query_df(client, f"""
-            SELECT sku, date, predicted_demand
-            FROM `{args.project}.{args.dataset}.demand_forecast`
-            WHERE date >= CURRENT_DATE() AND date < DATE_ADD(CURRENT_DATE(), INTERVAL {args.horizon} DAY)
-        """)
+    for table in sources:
+        if fc.empty and table_exists(client, project, dataset, table):
+            fc = query_df(client, f"""
+                SELECT sku, date, predicted_demand
+                FROM `{project}.{dataset}.{table}`
+                WHERE date >= CURRENT_DATE() AND date < DATE_ADD(CURRENT_DATE(), INTERVAL {horizon} DAY)
+                  AND {where_shard}
+            """)
 
     if fc.empty:
-        if args.prefer_bqml:
+        if prefer_bqml:
             print("No forecast found for horizon; training BQML ARIMA_PLUS...")
-            ensure_bqml_forecast(client, args.project, args.dataset, args.horizon)
+            ensure_bqml_forecast(client, project, dataset, horizon, shard=shard, refresh_daily=refresh_daily)
             fc = query_df(client, f"""
                 SELECT sku, date, predicted_demand
-                FROM `{args.project}.{args.dataset}.demand_forecast`
-                WHERE date >= CURRENT_DATE() AND date < DATE_ADD(CURRENT_DATE(), INTERVAL {args.horizon} DAY)
+                FROM `{project}.{dataset}.{fc_table}`
+                WHERE date >= CURRENT_DATE() AND date < DATE_ADD(CURRENT_DATE(), INTERVAL {horizon} DAY)
             """)
         if fc.empty:
             print("No forecast available; using naive average of last 30 days from fact_pick.")
             # Fallback: build a flat forecast using last 30 days avg picks per SKU
             daily = query_df(client, f"""
                 SELECT sku, DATE(event_ts) AS date, SUM(qty) AS qty
-                FROM `{args.project}.{args.dataset}.fact_pick`
+                FROM `{project}.{dataset}.fact_pick`
                 WHERE DATE(event_ts) >= DATE_SUB(CURRENT_DATE(), INTERVAL 30 DAY)
+                  AND {where_shard}
                 GROUP BY sku, date
             """)
             if daily.empty:
                 raise SystemExit("No picks in the last 30 days to build a naive forecast.")
             avg = daily.groupby('sku', as_index=False)['qty'].mean().rename(columns={'qty':'avg_daily'})
-            future_dates = pd.date_range(pd.Timestamp.today().normalize(), periods=args.horizon, freq='D')
+            future_dates = pd.date_range(pd.Timestamp.today().normalize(), periods=horizon, freq='D')
             fc = avg.assign(key=1).merge(
                 pd.DataFrame({'date': future_dates, 'key': 1}), on='key').drop(columns=['key'])
             fc['predicted_demand'] = fc['avg_daily']
@@ -137,12 +175,13 @@ def main():
     # Aggregate over horizon per SKU
     horizon_df = (fc.groupby('sku', as_index=False)['predicted_demand']
                   .sum().rename(columns={'predicted_demand':'demand_horizon'}))
-    horizon_df['daily'] = horizon_df['demand_horizon'] / float(args.horizon)
+    horizon_df['daily'] = horizon_df['demand_horizon'] / float(horizon)
 
     # On-hand (sum across locations)
     stock = query_df(client, f"""
         SELECT sku, SUM(on_hand) AS on_hand
-        FROM `{args.project}.{args.dataset}.fact_stock_snapshot`
+        FROM `{project}.{dataset}.fact_stock_snapshot`
+        WHERE {where_shard}
         GROUP BY sku
     """)
     if stock.empty:
@@ -151,7 +190,7 @@ def main():
 
     # Merge + compute plan
     df = horizon_df.merge(stock, on='sku', how='left').fillna({'on_hand': 0})
-    df['safety_qty'] = df['daily'] * float(args.safety_days)
+    df['safety_qty'] = df['daily'] * float(safety_days)
     df['net_req'] = (df['demand_horizon'] + df['safety_qty'] - df['on_hand']).clip(lower=0)
     df['recommended_order_qty'] = df['net_req'].apply(lambda x: int(math.ceil(x)))
 
@@ -159,14 +198,42 @@ def main():
         d = row['daily']
         if d <= 0: return None
         days_cover = row['on_hand'] / d
-        return None if days_cover >= (args.horizon + args.safety_days) else int(math.floor(days_cover))
+        return None if days_cover >= (horizon + safety_days) else int(math.floor(days_cover))
 
     df['est_days_until_stockout'] = df.apply(stockout_day, axis=1)
     out = df[['sku','on_hand','demand_horizon','safety_qty','recommended_order_qty','est_days_until_stockout']]
 
-    dest = f"{args.project}.{args.dataset}.inventory_plan"
+    dest = f"{project}.{dataset}.{shard_table('inventory_plan', shard)}"
     load_df(client, out, dest, write_disposition="WRITE_TRUNCATE")
     print(f"Wrote {len(out)} rows to {dest}.")
 
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--project", default=os.getenv("GCP_PROJECT_ID"), help="GCP project ID")
+    parser.add_argument("--dataset", default=os.getenv("BQ_DATASET", "warehouse"), help="BigQuery dataset")
+    parser.add_argument("--horizon", type=int, default=int(os.getenv("HORIZON_DAYS", 14)), help="Forecast horizon days")
+    parser.add_argument("--safety-days", type=int, default=int(os.getenv("SAFETY_DAYS", 7)), dest="safety_days", help="Safety stock days")
+    parser.add_argument("--prefer-bqml", action="store_true", help="If no demand_forecast data for horizon, train BQML ARIMA and use it")
+    parser.add_argument("--shard-index", type=int, default=None, help="SKU hash shard to plan (0-based)")
+    parser.add_argument("--shard-count", type=int, default=None, help="Total number of SKU hash shards")
+    parser.add_argument("--merge-shards", type=int, default=None, metavar="N", help="Union inventory_plan__shard_0..N-1 into inventory_plan and exit")
+    args = parser.parse_args(argv)
+
+    if not args.project:
+        raise SystemExit("Project ID not set. Use --project or export GCP_PROJECT_ID.")
+
+    init_tracing()
+    client = bigquery.Client(project=args.project, credentials=load_credentials())
+    if args.merge_shards:
+        merge_shards(client, args.project, args.dataset, "inventory_plan", args.merge_shards)
+        print(f"Merged {args.merge_shards} shards into inventory_plan.")
+        return
+    shard = None
+    if args.shard_count:
+        if args.shard_index is None or not 0 <= args.shard_index < args.shard_count:
+            raise SystemExit("--shard-index must be in [0, --shard-count).")
+        shard = (args.shard_index, args.shard_count)
+    run(client, args.project, args.dataset, args.horizon, args.safety_days, args.prefer_bqml, shard=shard)
+
 if __name__ == "__main__":
     main()
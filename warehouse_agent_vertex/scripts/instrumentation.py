@@ -0,0 +1,423 @@
+"""Lightweight tracing for agent steps, tools, LLM calls and BigQuery jobs.
+
+Off by default. With WAREHOUSE_TRACE=1:
+  - init_tracing() patches bigquery.Client.query and Client.query_and_wait
+    (used by the DB-API cursor, so the SQLAlchemy dialect and SQL toolkit) so
+    every job records a span with bytes processed/billed, slot-ms, cache hit
+    and queue/exec time once its result is fetched (dry runs: on submit).
+  - instrument_tool()/instrument_tools() wrap LangChain tools (func-based and
+    BaseTool subclasses such as the SQL toolkit) in a "tool" span.
+  - TraceCallbackHandler, passed to agent.run(callbacks=[...]), records one
+    span per agent run and per LLM call (with token counts).
+  - span()/traced() time any other block or function; record_cache() counts
+    cache hits/misses.
+Spans are appended to WAREHOUSE_TRACE_PATH (JSONL). If WAREHOUSE_METRICS_PORT
+is set, aggregated counters are served in Prometheus text format on /metrics.
+
+When disabled, span() returns a shared no-op context manager, traced()
+returns the function unchanged, tools are returned as-is and nothing is patched.
+"""
+import atexit, contextvars, functools, json, threading, time, uuid
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from scripts.config import config
+
+_current = contextvars.ContextVar("warehouse_span", default=None)
+_lock = threading.Lock()
+_initialized = False
+
+
+def enabled() -> bool:
+    return config.TRACE_ENABLED
+
+
+# ---- export -----------------------------------------------------------------
+
+class _Exporter:
+    """Buffered JSONL writer + in-memory aggregates for /metrics."""
+
+    def __init__(self, path: str, flush_every: int = 200):
+        self.path = path
+        self.flush_every = flush_every
+        self._buf = []
+        self.count = defaultdict(int)          # (kind, name, status) -> spans
+        self.seconds = defaultdict(float)      # (kind, name) -> total seconds
+        self.counters = defaultdict(float)     # metric name (+labels) -> value
+        atexit.register(self.flush)
+
+    def export(self, rec: dict):
+        key = (rec["kind"], rec["name"])
+        with _lock:
+            self.count[key + (rec["status"],)] += 1
+            self.seconds[key] += rec["duration_ms"] / 1000.0
+            attrs = rec["attrs"]
+            for attr, metric in (("prompt_tokens", "llm_prompt_tokens_total"),
+                                 ("completion_tokens", "llm_completion_tokens_total"),
+                                 ("total_bytes_processed", "bq_bytes_processed_total"),
+                                 ("total_bytes_billed", "bq_bytes_billed_total"),
+                                 ("slot_millis", "bq_slot_millis_total")):
+                if attrs.get(attr):
+                    self.counters[metric] += attrs[attr]
+            if "cache_hit" in attrs:
+                self.counters[f'bq_cache_total{{hit="{str(bool(attrs["cache_hit"])).lower()}"}}'] += 1
+            self._buf.append(rec)
+            if len(self._buf) >= self.flush_every:
+                self._flush_locked()
+
+    def incr(self, metric: str, value: float = 1.0):
+        with _lock:
+            self.counters[metric] += value
+
+    def flush(self):
+        with _lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._buf:
+            return
+        with open(self.path, "a", encoding="utf-8") as fh:
+            fh.writelines(json.dumps(r, default=str) + "\n" for r in self._buf)
+        self._buf.clear()
+
+    def prometheus(self) -> str:
+        lines = ["# TYPE warehouse_span_total counter"]
+        with _lock:
+            for (kind, name, status), n in sorted(self.count.items()):
+                lines.append(f'warehouse_span_total{{kind="{kind}",name="{name}",status="{status}"}} {n}')
+            lines.append("# TYPE warehouse_span_seconds_total counter")
+            for (kind, name), s in sorted(self.seconds.items()):
+                lines.append(f'warehouse_span_seconds_total{{kind="{kind}",name="{name}"}} {s:.6f}')
+            for metric, v in sorted(self.counters.items()):
+                lines.append(f"warehouse_{metric} {v:g}")
+        return "\n".join(lines) + "\n"
+
+
+_exporter = None
+
+
+def _serve_metrics(port: int):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = _exporter.prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+
+# ---- spans ------------------------------------------------------------------
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "kind", "name", "attrs", "start", "_t0", "_token")
+
+    def __init__(self, kind: str, name: str, parent=None, **attrs):
+        parent = parent if parent is not None else _current.get()
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.span_id = uuid.uuid4().hex[:16]
+        self.kind, self.name, self.attrs = kind, name, attrs
+        self.start = time.time()
+        self._t0 = time.perf_counter()
+        self._token = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def activate(self):
+        self._token = _current.set(self)
+        return self
+
+    def end(self, status: str = "ok", error: BaseException = None):
+        if self._token is not None:
+            try:
+                _current.reset(self._token)
+            except ValueError:  # ended from another context (callback thread)
+                pass
+            self._token = None
+        if error is not None:
+            self.attrs["error"] = f"{type(error).__name__}: {error}"
+        _exporter.export({
+            "trace_id": self.trace_id, "span_id": self.span_id, "parent_id": self.parent_id,
+            "kind": self.kind, "name": self.name, "start_ts": self.start,
+            "duration_ms": round((time.perf_counter() - self._t0) * 1000, 3),
+            "status": status, "attrs": self.attrs,
+        })
+
+    def __enter__(self):
+        return self.activate()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end("error" if exc else "ok", exc)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def set(self, **attrs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+def span(kind: str, name: str, **attrs):
+    """Context manager timing a block. Cheap no-op when tracing is off."""
+    if not config.TRACE_ENABLED:
+        return _NOOP
+    init_tracing()
+    return Span(kind, name, **attrs)
+
+
+def traced(kind: str, name: str = None):
+    """Decorator version of span(); returns fn unchanged when tracing is off."""
+    def wrap(fn):
+        if not config.TRACE_ENABLED:
+            return fn
+        init_tracing()
+        label = name or fn.__qualname__
+
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            with Span(kind, label):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+
+def record_cache(name: str, hit: bool):
+    if config.TRACE_ENABLED and _exporter:
+        _exporter.incr(f'cache_total{{cache="{name}",hit="{str(hit).lower()}"}}')
+
+
+# ---- BigQuery ---------------------------------------------------------------
+
+def _job_stats(job) -> dict:
+    stats = {"job_id": getattr(job, "job_id", None)}
+    for attr in ("total_bytes_processed", "total_bytes_billed", "slot_millis", "cache_hit",
+                 "statement_type"):
+        try:
+            stats[attr] = getattr(job, attr)
+        except Exception:
+            pass
+    created, started, ended = (getattr(job, a, None) for a in ("created", "started", "ended"))
+    if created and started:
+        stats["queue_ms"] = (started - created).total_seconds() * 1000
+    if started and ended:
+        stats["exec_ms"] = (ended - started).total_seconds() * 1000
+    return stats
+
+
+def _patch_bigquery():
+    try:
+        from google.cloud import bigquery
+    except ImportError:  # process without BigQuery (e.g. local tools); nothing to patch
+        return
+
+    original = bigquery.Client.query
+    if getattr(original, "_warehouse_traced", False):
+        return
+    original_wait = getattr(bigquery.Client, "query_and_wait", None)   # google-cloud-bigquery >= 3.15
+
+    @functools.wraps(original)
+    def query(self, sql, *args, **kwargs):
+        s = Span("bigquery", "client.query", sql=" ".join(str(sql).split())[:300])
+        try:
+            job = original(self, sql, *args, **kwargs)
+        except Exception as e:
+            s.end("error", e)
+            raise
+        if getattr(job, "dry_run", False):
+            # Dry runs are complete on submit and their result() is never called
+            s.set(dry_run=True, **_job_stats(job))
+            s.end()
+            return job
+        job_result = job.result
+
+        def result(*a, **kw):
+            # Span covers submit -> rows ready; stats are only final after result().
+            try:
+                rows = job_result(*a, **kw)
+            except Exception as e:
+                s.end("error", e)
+                raise
+            if not getattr(result, "_done", False):
+                result._done = True
+                s.set(**_job_stats(job))
+                s.end()
+            return rows
+        job.result = result
+        return job
+
+    query._warehouse_traced = True
+    bigquery.Client.query = query
+
+    if original_wait is None:
+        return
+
+    @functools.wraps(original_wait)
+    def query_and_wait(self, sql, *args, **kwargs):
+        # Returns a RowIterator with the first page loaded; it carries the job stats
+        s = Span("bigquery", "client.query_and_wait", sql=" ".join(str(sql).split())[:300])
+        try:
+            rows = original_wait(self, sql, *args, **kwargs)
+        except Exception as e:
+            s.end("error", e)
+            raise
+        s.set(**_job_stats(rows))
+        s.end()
+        return rows
+
+    bigquery.Client.query_and_wait = query_and_wait
+
+
+# ---- LangChain --------------------------------------------------------------
+
+def _callback_base():
+    try:
+        from langchain_core.callbacks import BaseCallbackHandler
+    except ImportError:
+        from langchain.callbacks.base import BaseCallbackHandler
+    return BaseCallbackHandler
+
+
+def _token_usage(response) -> dict:
+    usage = (getattr(response, "llm_output", None) or {}).get("usage_metadata") or {}
+    if not usage:
+        for gens in getattr(response, "generations", []) or []:
+            for g in gens:
+                msg = getattr(g, "message", None)
+                meta = getattr(msg, "usage_metadata", None) if msg else None
+                if meta:
+                    usage = meta
+                    break
+    out = {}
+    for src, dst in (("input_tokens", "prompt_tokens"), ("prompt_token_count", "prompt_tokens"),
+                     ("output_tokens", "completion_tokens"), ("candidates_token_count", "completion_tokens"),
+                     ("total_tokens", "total_tokens"), ("total_token_count", "total_tokens")):
+        if usage.get(src) is not None:
+            out[dst] = usage[src]
+    return out
+
+
+def make_callback_handler():
+    """A LangChain callback handler recording agent and LLM spans, or None when tracing is off."""
+    if not config.TRACE_ENABLED:
+        return None
+    init_tracing()
+    Base = _callback_base()
+
+    class TraceCallbackHandler(Base):
+        def __init__(self):
+            super().__init__()
+            self._spans = {}
+
+        def _start(self, run_id, parent_run_id, kind, name, **attrs):
+            parent = self._spans.get(parent_run_id)
+            self._spans[run_id] = Span(kind, name, parent=parent, **attrs).activate()
+
+        def _end(self, run_id, status="ok", error=None, **attrs):
+            s = self._spans.pop(run_id, None)
+            if s:
+                s.set(**attrs)
+                s.end(status, error)
+
+        def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, **kw):
+            if parent_run_id is None:  # only the top-level agent run
+                self._start(run_id, None, "agent", "agent.run")
+
+        def on_chain_end(self, outputs, *, run_id, **kw):
+            self._end(run_id)
+
+        def on_chain_error(self, error, *, run_id, **kw):
+            self._end(run_id, "error", error)
+
+        def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, **kw):
+            self._start(run_id, parent_run_id, "llm", (serialized or {}).get("name") or "llm",
+                        prompt_chars=sum(len(p) for p in prompts))
+
+        def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, **kw):
+            chars = sum(len(str(m.content)) for batch in messages for m in batch)
+            self._start(run_id, parent_run_id, "llm", (serialized or {}).get("name") or "chat_model",
+                        prompt_chars=chars)
+
+        def on_llm_end(self, response, *, run_id, **kw):
+            self._end(run_id, **_token_usage(response))
+
+        def on_llm_error(self, error, *, run_id, **kw):
+            self._end(run_id, "error", error)
+
+    return TraceCallbackHandler()
+
+
+def instrument_tool(tool):
+    """Wrap a LangChain tool so each call records a "tool" span. No-op when tracing is off."""
+    if not config.TRACE_ENABLED or getattr(tool, "_warehouse_traced", False):
+        return tool
+    init_tracing()
+    name = tool.name
+    func = getattr(tool, "func", None)
+    if func is not None:
+        @functools.wraps(func)
+        def traced_func(*args, **kwargs):
+            with Span("tool", name, input=str(args[0] if args else kwargs)[:200]) as s:
+                out = func(*args, **kwargs)
+                s.set(output_chars=len(str(out)))
+                return out
+        tool.func = traced_func
+    else:
+        run = tool._run
+
+        @functools.wraps(run)
+        def traced_run(*args, **kwargs):
+            with Span("tool", name, input=str(args[0] if args else kwargs)[:200]) as s:
+                out = run(*args, **kwargs)
+                s.set(output_chars=len(str(out)))
+                return out
+        object.__setattr__(tool, "_run", traced_run)
+    object.__setattr__(tool, "_warehouse_traced", True)
+    return tool
+
+
+def instrument_tools(tools: list) -> list:
+    return [instrument_tool(t) for t in tools]
+
+
+def trace_callbacks() -> list:
+    """[handler] when tracing is on, else [] — pass as agent.run(..., callbacks=trace_callbacks())."""
+    handler = make_callback_handler()
+    return [handler] if handler else []
+
+
+# ---- setup ------------------------------------------------------------------
+
+def init_tracing():
+    """Idempotent. Does nothing unless WAREHOUSE_TRACE is set."""
+    global _initialized, _exporter
+    if not config.TRACE_ENABLED or _initialized:
+        return
+    with _lock:
+        if _initialized:
+            return
+        _exporter = _Exporter(config.TRACE_PATH)
+        _patch_bigquery()
+        if config.METRICS_PORT:
+            _serve_metrics(config.METRICS_PORT)
+        _initialized = True
@@ -0,0 +1,291 @@
+"""Deterministic fast path in front of the LLM agent.
+
+Routine questions come in a few fixed shapes. route() matches them with regexes
+and answers from the precomputed tables, so they make no Gemini round trip:
+  forecast     "forecast for SKU123", "demand next week SKU1 SKU2"  -> demand_forecast
+  cross_sell   "cross-sell for SKU123", "what goes with SKU1, SKU2"  -> cross_sell index
+  price        "price recommendation for SKU123"                    -> price_recommendations
+  low_stock    "SKUs below safety stock", "suggest restocks"        -> inventory_plan
+It returns None, so the caller falls back to agent.run(), when no intent
+matches, when more than one matches, when a SKU intent has no SKU, when the
+question asks for an action (place/approve/update ...), or when it needs
+analysis the tables can't answer: history ("last month", "in 2023", "did we
+sell"), comparisons ("vs", "compared to") and why/explain/elasticity.
+Forecast windows ("next 30 days", "next month", "tomorrow") are parsed; the
+next 7 days otherwise. SKUs are ids like SKU123 / AB-1234, or "SKU 100049".
+Answers are cached for ROUTER_CACHE_TTL seconds because the tables only change
+nightly.
+
+ROUTED and NOT_ROUTED list questions that must / must not take the fast path;
+`python -m scripts.intent_router --check` verifies both without BigQuery.
+
+    router = IntentRouter()
+    answer = router.route(question) or agent.run(question)
+"""
+import argparse, re, sys, time
+from typing import Callable, List, NamedTuple, Optional
+from google.cloud import bigquery
+from scripts.config import config
+from scripts.instrumentation import record_cache, span
+
+SKU_RE = re.compile(config.ROUTER_SKU_PATTERN)
+# Anything that changes state goes through the agent (and its approval gates)
+ACTION_RE = re.compile(r"\b(place|order|approve|update|delete|insert|change|set|refresh|trigger)\b", re.I)
+# History, comparisons and explanations need the agent, not a precomputed lookup
+ANALYSIS_RE = re.compile(
+    r"\b(why|explain\w*|elasticity|elastic|trend\w*|histor\w*|compar\w*|vs\.?|versus|than|"
+    r"last|past|previous|prior|ago|yesterday|since|ytd|"
+    r"did|was|were|had|sold|picked|shipped|received|ordered)\b|\b(19|20)\d{2}\b", re.I)
+HORIZON_RE = re.compile(
+    r"\b(?:next|coming|upcoming)\s+(?:(\d+|a|one|two|three|four)\s+)?(day|week|month)s?\b"
+    r"|\b(\d+)[- ]?(day|week|month)s?\b", re.I)
+_WORD_NUMS = {"a": 1, "one": 1, "two": 2, "three": 3, "four": 4}
+_UNIT_DAYS = {"day": 1, "week": 7, "month": 30}
+DEFAULT_HORIZON = 7
+DAY_RE = re.compile(r"\b(today|tonight|tomorrow)\b", re.I)
+
+# Questions the fast path must answer: (question, intent, skus) (see --check)
+ROUTED = [
+    ("forecast for SKU123", "forecast", ["SKU123"]),
+    ("demand next week SKU12 SKU13", "forecast", ["SKU12", "SKU13"]),
+    ("forecast for SKU12 over the next 30 days", "forecast", ["SKU12"]),
+    ("forecast for SKU 100049 tomorrow", "forecast", ["100049"]),
+    ("cross-sell for SKU123", "cross_sell", ["SKU123"]),
+    ("what goes with SKU1, SKU2", "cross_sell", ["SKU1", "SKU2"]),
+    ("Recommend cross-sell for SKU 100049", "cross_sell", ["100049"]),
+    ("price recommendation for AB-1234", "price", ["AB-1234"]),
+    ("SKUs below safety stock", "low_stock", []),
+    ("List SKUs below safety stock and suggest restocks for next week", "low_stock", []),
+]
+
+# Routine-looking questions that must fall through to the agent (see --check)
+NOT_ROUTED = [
+    "How many units of ABC123 did we sell last month?",
+    "demand for SKU1234 vs last year",
+    "price elasticity for SKU12 in 2023",
+    "what is the stockout ETA for SKU1234",
+    "why is the forecast for SKU12 so high?",
+    "explain the price recommendation for SKU12",
+    "compare cross-sell for SKU12 with SKU13",
+    "what was the forecast for SKU12 last week",
+    "forecast for SKU12 compared to actuals",
+    "when will SKU1234 run out of stock",
+]
+
+def find_skus(question: str) -> list:
+    """SKU ids in order of appearance; for "SKU 100049" the id is the part after "SKU"."""
+    skus = []
+    for m in SKU_RE.finditer(question):
+        skus.append(next((g for g in m.groups() if g), m.group(0)))
+    return list(dict.fromkeys(skus))
+
+def parse_window(question: str):
+    """(start offset, days) of the forecast asked for: "tomorrow" -> (1, 1),
+    "today" -> (0, 1), "next 30 days" / "next month" / "14-day" -> (0, n);
+    (0, DEFAULT_HORIZON) otherwise."""
+    day = DAY_RE.search(question)
+    if day:
+        return (1, 1) if day.group(1).lower() == "tomorrow" else (0, 1)
+    return 0, parse_horizon(question)
+
+def parse_horizon(question: str) -> int:
+    """Days asked for ("next 30 days", "next month", "14-day"); DEFAULT_HORIZON otherwise."""
+    m = HORIZON_RE.search(question)
+    if not m:
+        return DEFAULT_HORIZON
+    if m.group(2):
+        n, unit = m.group(1), m.group(2)
+        n = int(n) if n and n.isdigit() else _WORD_NUMS.get((n or "a").lower(), 1)
+    else:
+        n, unit = int(m.group(3)), m.group(4)
+    return max(1, n * _UNIT_DAYS[unit.lower()])
+
+class Intent(NamedTuple):
+    name: str
+    pattern: re.Pattern
+    needs_sku: bool
+    handler: Callable   # (router, skus, question) -> str
+
+def _fmt_list(items):
+    return ", ".join(items) if items else "none"
+
+class IntentRouter:
+    def __init__(self, client=None, ds: str = None, cache_ttl: int = None):
+        self._client = client
+        self.ds = ds or f"{config.GCP_PROJECT_ID}.{config.BQ_DATASET}"
+        self.cache_ttl = config.ROUTER_CACHE_TTL if cache_ttl is None else cache_ttl
+        self._cache = {}
+        self.intents: List[Intent] = [
+            Intent("cross_sell", re.compile(
+                r"cross[- ]?sell|bought together|goes? (well )?with|pairs? with|add to (the )?basket|"
+                r"frequently .* with|also buy", re.I), True, IntentRouter.cross_sell),
+            Intent("price", re.compile(
+                r"price recommendations?|pricing recommendations?|recommended price|markdown|discount",
+                re.I), True, IntentRouter.price),
+            Intent("forecast", re.compile(
+                r"forecast|predicted demand|expected demand|demand (for |over )?(the )?(next|coming|upcoming)",
+                re.I), True, IntentRouter.forecast),
+            Intent("low_stock", re.compile(
+                r"below safety|safety stock|low[- ]stock|running low|"
+                r"(need|needs|suggest\w*) (a )?restock|restocks?\b", re.I), False, IntentRouter.low_stock),
+        ]
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = bigquery.Client(project=config.GCP_PROJECT_ID)
+        return self._client
+
+    def _query(self, sql, skus=None, limit=None, days=None, start=None):
+        params = []
+        if skus is not None:
+            params.append(bigquery.ArrayQueryParameter("skus", "STRING", skus))
+        if days is not None:
+            params.append(bigquery.ScalarQueryParameter("days", "INT64", days))
+        if start is not None:
+            params.append(bigquery.ScalarQueryParameter("start", "INT64", start))
+        if limit is not None:
+            params.append(bigquery.ScalarQueryParameter("limit", "INT64", limit))
+        return list(self.client.query(sql, job_config=bigquery.QueryJobConfig(query_parameters=params)).result())
+
+    # ---- matching -----------------------------------------------------------
+
+    def match(self, question: str):
+        """(intent, skus) for an unambiguous routine question, else None."""
+        if ACTION_RE.search(question) or ANALYSIS_RE.search(question):
+            return None
+        hits = [i for i in self.intents if i.pattern.search(question)]
+        if len(hits) != 1:
+            return None
+        intent = hits[0]
+        skus = find_skus(question)
+        if intent.needs_sku and not skus:
+            return None
+        return intent, skus
+
+    def route(self, question: str) -> Optional[str]:
+        m = self.match(question)
+        if m is None:
+            record_cache("intent_router", False)
+            return None
+        intent, skus = m
+        key = (intent.name, tuple(skus), parse_window(question) if intent.name == "forecast" else None)
+        cached = self._cache.get(key)
+        if cached and time.monotonic() - cached[0] < self.cache_ttl:
+            record_cache("intent_router_answers", True)
+            return cached[1]
+        with span("router", intent.name, skus=len(skus)) as s:
+            try:
+                answer = intent.handler(self, skus, question)
+            except Exception as e:
+                s.set(fallback=str(e)[:200])
+                return None  # let the agent handle it
+        record_cache("intent_router", True)
+        record_cache("intent_router_answers", False)
+        if len(self._cache) >= 10_000:
+            self._cache.clear()
+        self._cache[key] = (time.monotonic(), answer)
+        return answer
+
+    # ---- handlers -----------------------------------------------------------
+
+    def forecast(self, skus, question=""):
+        start, days = parse_window(question)
+        rows = self._query(f"""
+          SELECT sku, date, predicted_demand
+          FROM `{self.ds}.demand_forecast`
+          WHERE sku IN UNNEST(@skus)
+            AND date >= DATE_ADD(CURRENT_DATE(), INTERVAL @start DAY)
+            AND date < DATE_ADD(CURRENT_DATE(), INTERVAL @start + @days DAY)
+          ORDER BY sku, date
+        """, skus=skus, days=days, start=start)
+        by_sku = {}
+        for r in rows:
+            by_sku.setdefault(r.sku, []).append(f"{r.date}: {int(r.predicted_demand)}")
+        label = {(0, 1): "today", (1, 1): "tomorrow"}.get((start, days), f"next {days} days")
+        out = [f"Forecast, {label}:"]
+        for sku in skus:
+            days_found = by_sku.get(sku, [])
+            if not days_found:
+                out.append(f"{sku}: no forecast")
+                continue
+            short = f" (forecast covers only {len(days_found)} days)" if len(days_found) < days else ""
+            out.append(f"{sku}: " + " | ".join(days_found) + short)
+        return "\n".join(out)
+
+    def cross_sell(self, skus, question=""):
+        from scripts.cross_sell_index import get_index
+        index = get_index()
+        if len(skus) == 1:
+            return f"Cross-sell for {skus[0]}: {_fmt_list([s for s, _ in index.top(skus[0], 5)])}"
+        return (f"Cross-sell for basket {', '.join(skus)}: "
+                f"{_fmt_list([s for s, _ in index.basket(skus, 5)])}")
+
+    def price(self, skus, question=""):
+        rows = self._query(f"""
+          SELECT sku, current_price, recommended_price, days_of_cover
+          FROM `{self.ds}.price_recommendations`
+          WHERE sku IN UNNEST(@skus)
+        """, skus=skus)
+        found = {r.sku: r for r in rows}
+        out = []
+        for sku in skus:
+            r = found.get(sku)
+            if r is None:
+                out.append(f"{sku}: no price recommendation")
+                continue
+            cover = f", {r.days_of_cover:.0f} days of cover" if r.days_of_cover is not None else ""
+            out.append(f"{sku}: {r.current_price:.2f} -> {r.recommended_price:.2f}{cover}")
+        return "\n".join(out)
+
+    def low_stock(self, skus, question="", limit: int = 20):
+        sku_filter = "AND sku IN UNNEST(@skus)" if skus else ""
+        rows = self._query(f"""
+          SELECT sku, on_hand, safety_qty, recommended_order_qty, est_days_until_stockout,
+                 COUNT(*) OVER () AS total
+          FROM `{self.ds}.inventory_plan`
+          WHERE on_hand < safety_qty {sku_filter}
+          ORDER BY est_days_until_stockout IS NULL, est_days_until_stockout, recommended_order_qty DESC
+          LIMIT @limit
+        """, skus=skus or None, limit=limit)
+        if not rows:
+            return "No SKUs are below safety stock."
+        lines = [f"{rows[0].total} SKUs below safety stock (most urgent first; suggested order qty):"]
+        lines += [f"{r.sku}: on hand {r.on_hand:g}, safety {r.safety_qty:.0f}, order {r.recommended_order_qty}"
+                  + (f", stockout in {r.est_days_until_stockout} days"
+                     if r.est_days_until_stockout is not None else "")
+                  for r in rows]
+        return "\n".join(lines)
+
+def check(router=None) -> list:
+    """Failures: ROUTED cases matched to the wrong intent/SKUs, NOT_ROUTED cases that match."""
+    router = router or IntentRouter(client=object())
+    failures = []
+    for q, intent, skus in ROUTED:
+        m = router.match(q)
+        got = (m[0].name, m[1]) if m else (None, [])
+        if got != (intent, skus):
+            failures.append(f"should route to {intent} {skus}, got {got[0]} {got[1]}: {q!r}")
+    for q in NOT_ROUTED:
+        m = router.match(q)
+        if m is not None:
+            failures.append(f"should fall back, routed to {m[0].name}: {q!r}")
+    return failures
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--check", action="store_true", help="verify the ROUTED / NOT_ROUTED examples")
+    ap.add_argument("question", nargs="*")
+    args = ap.parse_args(argv)
+    if args.check:
+        router = IntentRouter(client=object())   # match() never touches BigQuery
+        failures = check(router)
+        for f in failures:
+            print(f"FAIL {f}")
+        print(f"{len(ROUTED) + len(NOT_ROUTED) - len(failures)}/{len(ROUTED) + len(NOT_ROUTED)} ok")
+        sys.exit(1 if failures else 0)
+    if args.question:
+        print(IntentRouter().route(" ".join(args.question)))
+
+if __name__ == "__main__":
+    main()
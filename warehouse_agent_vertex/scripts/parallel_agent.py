@@ -0,0 +1,115 @@
+"""Tool-calling agent that runs a step's tool calls concurrently.
+
+The ReAct agent alternates one LLM step with one tool call, so "forecast and
+cross-sell for these 10 SKUs" costs 20 serial round trips. Here the model is
+bound to the tools with native function calling (Gemini can emit several calls
+per turn). Every call in a turn runs on a shared thread pool, and the results
+go back as ToolMessages in the model's call order. A multi-SKU question then
+takes about one tool latency per step.
+
+Per-tool limits (TOOL_CONCURRENCY, e.g. "sql_db_query=4,VertexHybridCrossSell=2")
+cap how many calls of one tool run at once. Tools without an entry share the
+pool (TOOL_POOL_WORKERS) with no extra limit. Tool spans stay nested under the
+agent run because each call runs in a copy of the caller's context.
+
+The pool's threads are released by close() (or `with ParallelToolAgent(...)`),
+and otherwise when the pool is garbage-collected or the interpreter exits.
+"""
+import contextvars, threading, weakref
+from concurrent.futures import ThreadPoolExecutor
+from scripts.config import config
+from scripts.instrumentation import span
+
+try:
+    from langchain_core.messages import HumanMessage, SystemMessage, ToolMessage
+except Exception as e:
+    raise SystemExit("LangChain not installed. pip install langchain langchain-google-vertexai") from e
+
+SYSTEM_PROMPT = (
+    "You are a warehouse operations assistant with BigQuery-backed tools. "
+    "When a question needs several independent lookups (several SKUs, or forecast and "
+    "cross-sell for the same SKU), request all of those tool calls in the same turn; "
+    "they run in parallel. Answer concisely once you have the data."
+)
+
+def parse_limits(spec: str) -> dict:
+    """Parse "name=4,other=2" into {"name": 4, "other": 2}."""
+    limits = {}
+    for part in (spec or "").split(","):
+        name, _, n = part.partition("=")
+        if name.strip() and n.strip():
+            limits[name.strip()] = int(n)
+    return limits
+
+class ToolPool:
+    def __init__(self, tools, max_workers: int = None, limits: dict = None):
+        self.tools = {t.name: t for t in tools}
+        self.executor = ThreadPoolExecutor(max_workers=max_workers or config.TOOL_POOL_WORKERS,
+                                           thread_name_prefix="agent-tool")
+        limits = parse_limits(config.TOOL_CONCURRENCY) if limits is None else limits
+        self._sems = {name: threading.BoundedSemaphore(n) for name, n in limits.items()}
+        # Shut the executor down on GC / interpreter exit if close() is never called
+        self._finalizer = weakref.finalize(self, self.executor.shutdown, wait=False)
+
+    def _call(self, name, args):
+        tool = self.tools.get(name)
+        if tool is None:
+            return f"Unknown tool {name}. Available: {', '.join(self.tools)}"
+        sem = self._sems.get(name)
+        try:
+            if sem is None:
+                return str(tool.invoke(args))
+            with sem:
+                return str(tool.invoke(args))
+        except Exception as e:
+            return f"{name} failed: {e}"
+
+    def run(self, calls) -> list:
+        """Run [{"name", "args", "id"}] concurrently; results in call order."""
+        if len(calls) == 1:
+            return [self._call(calls[0]["name"], calls[0]["args"])]
+        futures = [self.executor.submit(contextvars.copy_context().run, self._call, c["name"], c["args"])
+                   for c in calls]
+        return [f.result() for f in futures]
+
+    def close(self):
+        self._finalizer.detach()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class ParallelToolAgent:
+    def __init__(self, llm, tools, max_steps: int = None, system_prompt: str = SYSTEM_PROMPT, pool=None):
+        self.llm = llm.bind_tools(tools)
+        self.pool = pool or ToolPool(tools)
+        self.max_steps = max_steps or config.AGENT_MAX_STEPS
+        self.system_prompt = system_prompt
+
+    def run(self, question: str, callbacks=None) -> str:
+        messages = [SystemMessage(content=self.system_prompt), HumanMessage(content=question)]
+        run_config = {"callbacks": callbacks or [], "run_name": "ParallelToolAgent"}
+        with span("agent", "ParallelToolAgent") as s:
+            for step in range(self.max_steps):
+                ai = self.llm.invoke(messages, config=run_config)
+                messages.append(ai)
+                calls = getattr(ai, "tool_calls", None) or []
+                if not calls:
+                    s.set(steps=step + 1)
+                    return ai.content if isinstance(ai.content, str) else str(ai.content)
+                for call, result in zip(calls, self.pool.run(calls)):
+                    messages.append(ToolMessage(content=result, tool_call_id=call["id"], name=call["name"]))
+            s.set(steps=self.max_steps, truncated=True)
+        return f"Stopped after {self.max_steps} steps without a final answer."
+
+    def close(self):
+        self.pool.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,23 @@
+"""Input fingerprints for change-aware pipeline stages.
+
+A stage's fingerprint hashes the last-modified time, row count and size of each
+of its input tables. It comes from table metadata only, so computing it costs no
+query bytes. The DAG stores the fingerprint after a stage succeeds and skips the
+stage on the next run when the fingerprint is unchanged.
+"""
+import hashlib, json
+
+def table_signature(client, table_id: str):
+    """[modified, num_rows, num_bytes] for a table, or None if it does not exist."""
+    try:
+        table = client.get_table(table_id)
+    except Exception:
+        return None
+    modified = getattr(table, "modified", None)
+    return [modified.isoformat() if modified else None,
+            getattr(table, "num_rows", None),
+            getattr(table, "num_bytes", None)]
+
+def input_fingerprint(client, project: str, dataset: str, tables) -> str:
+    signature = {t: table_signature(client, f"{project}.{dataset}.{t}") for t in sorted(tables)}
+    return hashlib.sha256(json.dumps(signature, sort_keys=True).encode()).hexdigest()[:16]
@@ -0,0 +1,151 @@
+"""Bulk restock from inventory_plan.
+
+Reads recommended_order_qty for every SKU that needs stock and splits the lines
+on MAX_AUTO_RESTOCK:
+  - amount <= MAX_AUTO_RESTOCK -> restock_orders   (status PLACED)
+  - amount >  MAX_AUTO_RESTOCK -> pending_actions  (status PENDING, approve via API)
+Each batch is one load job, so restocking hundreds of SKUs costs two writes.
+Load jobs (unlike streaming inserts) leave the rows updatable right away, so
+/approve works on them immediately.
+
+Repeating a call is safe. The batch_id is derived from the plan date and a
+hash of the plan lines, and SKUs that already have an open order are skipped.
+An order is open while it is PLACED in restock_orders, or PENDING or APPROVED
+in pending_actions, however old. It stops being open when its status moves on
+(e.g. RECEIVED or CANCELLED). Both tables come from
+`python -m scripts.schema_manager apply`.
+"""
+import hashlib, json
+from datetime import datetime, timezone
+from google.cloud import bigquery
+from scripts.config import config
+from scripts.schema_manager import ACTION_TABLES, get_table
+
+ORDERS_SCHEMA = [bigquery.SchemaField(c, t) for c, t in ACTION_TABLES["restock_orders"]]
+PENDING_SCHEMA = [bigquery.SchemaField(c, t) for c, t in ACTION_TABLES["pending_actions"]]
+
+def _ds():
+    return f"{config.GCP_PROJECT_ID}.{config.BQ_DATASET}"
+
+def plan_lines(client, ds=None, skus=None, min_qty=1, limit=None):
+    """[{sku, amount, on_hand, est_days_until_stockout}] from inventory_plan, most urgent first."""
+    ds = ds or _ds()
+    params = [bigquery.ScalarQueryParameter("min_qty", "INT64", min_qty)]
+    sku_filter = ""
+    if skus:
+        sku_filter = "AND sku IN UNNEST(@skus)"
+        params.append(bigquery.ArrayQueryParameter("skus", "STRING", list(skus)))
+    sql = f"""
+      SELECT sku, recommended_order_qty AS amount, on_hand, est_days_until_stockout
+      FROM `{ds}.inventory_plan`
+      WHERE recommended_order_qty >= @min_qty {sku_filter}
+      ORDER BY est_days_until_stockout IS NULL, est_days_until_stockout, recommended_order_qty DESC
+      {f"LIMIT {int(limit)}" if limit else ""}
+    """
+    job = client.query(sql, job_config=bigquery.QueryJobConfig(query_parameters=params))
+    return [dict(r) for r in job.result()]
+
+def split_lines(lines, max_auto=None):
+    """(auto, pending) by the MAX_AUTO_RESTOCK threshold."""
+    max_auto = config.MAX_AUTO_RESTOCK if max_auto is None else max_auto
+    auto = [l for l in lines if l["amount"] <= max_auto]
+    pending = [l for l in lines if l["amount"] > max_auto]
+    return auto, pending
+
+def plan_built_at(client, ds=None) -> datetime:
+    """When inventory_plan was last written (start of today UTC if unknown)."""
+    table = get_table(client, f"{ds or _ds()}.inventory_plan")
+    modified = getattr(table, "modified", None) if table else None
+    if modified:
+        return modified
+    return datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+
+def batch_key(plan_at: datetime, lines) -> str:
+    """Deterministic batch_id: plan date + hash of the (sku, amount) lines."""
+    body = json.dumps(sorted((l["sku"], int(l["amount"])) for l in lines))
+    return f"{plan_at:%Y%m%d}-{hashlib.sha256(body.encode()).hexdigest()[:12]}"
+
+def open_skus(client, skus, ds=None) -> set:
+    """SKUs among `skus` with an open restock order or approval (see module docstring)."""
+    ds = ds or _ds()
+    if not skus:
+        return set()
+    sql = f"""
+      SELECT sku FROM `{ds}.restock_orders`
+      WHERE sku IN UNNEST(@skus) AND status = 'PLACED'
+      UNION DISTINCT
+      SELECT sku FROM `{ds}.pending_actions`
+      WHERE sku IN UNNEST(@skus) AND IFNULL(status, 'PENDING') IN ('PENDING', 'APPROVED')
+    """
+    job = client.query(sql, job_config=bigquery.QueryJobConfig(query_parameters=[
+        bigquery.ArrayQueryParameter("skus", "STRING", list(skus)),
+    ]))
+    return {r.sku for r in job.result()}
+
+def _load(client, table_id, rows, schema):
+    if not rows:
+        return
+    job_config = bigquery.LoadJobConfig(
+        schema=schema,
+        write_disposition=bigquery.WriteDisposition.WRITE_APPEND,
+    )
+    client.load_table_from_json(rows, table_id, job_config=job_config).result()
+
+def submit(client, lines, ds=None, max_auto=None, dry_run=False) -> dict:
+    """Write the auto batch to restock_orders and the rest to pending_actions.
+
+    SKUs with open orders are skipped. A dry run writes nothing and returns no batch_id.
+    """
+    ds = ds or _ds()
+    plan_at = plan_built_at(client, ds)
+    batch_id = batch_key(plan_at, lines)
+    skip = open_skus(client, [l["sku"] for l in lines], ds)
+    auto, pending = split_lines([l for l in lines if l["sku"] not in skip], max_auto)
+    now = datetime.now(timezone.utc).isoformat()
+    # Row ids are deterministic too, so a duplicate from a concurrent retry is easy to spot
+    orders = [{"id": f"{batch_id}-{l['sku']}", "batch_id": batch_id, "sku": l["sku"], "amount": int(l["amount"]),
+               "status": "PLACED", "source": "inventory_plan", "created_at": now} for l in auto]
+    actions = [{"id": f"{batch_id}-{l['sku']}", "batch_id": batch_id, "action_type": "RESTOCK", "sku": l["sku"],
+                "amount": int(l["amount"]), "status": "PENDING", "created_at": now} for l in pending]
+    if not dry_run:
+        _load(client, f"{ds}.restock_orders", orders, ORDERS_SCHEMA)
+        _load(client, f"{ds}.pending_actions", actions, PENDING_SCHEMA)
+    return {
+        "batch_id": None if dry_run else batch_id,
+        "dry_run": dry_run,
+        "skipped": sorted(skip),
+        "placed": {"lines": len(orders), "units": sum(o["amount"] for o in orders)},
+        "pending": {"lines": len(actions), "units": sum(a["amount"] for a in actions)},
+        "auto": auto,
+        "pending_lines": pending,
+    }
+
+def bulk_restock(client=None, skus=None, min_qty=1, limit=None, max_auto=None, dry_run=False) -> dict:
+    client = client or bigquery.Client(project=config.GCP_PROJECT_ID)
+    return submit(client, plan_lines(client, skus=skus, min_qty=min_qty, limit=limit),
+                  max_auto=max_auto, dry_run=dry_run)
+
+def bulk_restock_tool(payload: str = "") -> str:
+    """Agent entry point. Input: empty for every SKU in inventory_plan, or SKU ids
+    separated by spaces/commas; append 'dry-run' to only preview."""
+    words = [w for w in payload.replace(",", " ").split() if w]
+    dry_run = any(w.lower() in ("dry-run", "dry_run", "preview") for w in words)
+    skus = [w for w in words if w.lower() not in ("dry-run", "dry_run", "preview", "all")]
+    res = bulk_restock(skus=skus or None, dry_run=dry_run)
+    skipped = (f" Skipped {len(res['skipped'])} SKUs with open orders: "
+               f"{', '.join(res['skipped'][:10])}{' ...' if len(res['skipped']) > 10 else ''}."
+               if res["skipped"] else "")
+    if not res["auto"] and not res["pending_lines"]:
+        return "No SKUs in inventory_plan need restocking." + skipped
+    verb = "Would place" if dry_run else "Placed"
+    batch = "" if dry_run else f" (batch {res['batch_id']})"
+    lines = [f"{verb} {res['placed']['lines']} restock orders ({res['placed']['units']} units); "
+             f"{res['pending']['lines']} lines ({res['pending']['units']} units) above "
+             f"{config.MAX_AUTO_RESTOCK} {'would need' if dry_run else 'pending'} human approval"
+             f"{batch}.{skipped}"]
+    top = sorted(res["auto"] + res["pending_lines"],
+                 key=lambda l: (l["est_days_until_stockout"] is None, l["est_days_until_stockout"] or 0))[:10]
+    lines += [f"{l['sku']}: {l['amount']} (on hand {l['on_hand']:g}, stockout in "
+              f"{l['est_days_until_stockout'] if l['est_days_until_stockout'] is not None else '-'} days)"
+              for l in top]
+    return "\n".join(lines)
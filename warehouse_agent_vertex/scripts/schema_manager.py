@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""Partitioned/clustered schemas for the warehouse fact tables.
+
+- fact_pick, fact_receipt, fact_stock_snapshot and demand_forecast are
+  day-partitioned on their timestamp/date and clustered by SKU, so the
+  date-window, per-SKU queries in forecast_planner, slotting_optimizer and
+  pricing prune partitions instead of scanning the full history.
+- daily_demand is a materialized view over fact_pick that BigQuery refreshes
+  incrementally. ensure_daily_demand and etl_bq leave it alone. The view starts
+  DAILY_DEMAND_HISTORY_DAYS before the day it is created; a literal date rather
+  than CURRENT_DATE(), which incremental views do not allow. Drop it and re-run
+  `apply` to move the start forward.
+- sku_velocity is a view over daily_demand using the slotting lookback window.
+  An incremental materialized view cannot contain CURRENT_DATE(), so the
+  window lives in a view on top of the small, partitioned view.
+
+restock_orders and pending_actions (human-approval queue) are created with
+the columns scripts/restock_bq.py writes, and older tables gain any missing
+columns (such as batch_id) in place.
+
+`apply` creates missing tables. It migrates existing tables whose
+partitioning/clustering differs by copying them into a new table and swapping
+names. The original is kept as <table>__premigration until you pass
+--drop-backups. The same applies to daily_demand and sku_velocity tables that
+are replaced by views. Pause the Pub/Sub subscriptions that write fact_pick and
+fact_receipt while migrating, because a table with rows in the streaming
+buffer cannot be renamed.
+
+Usage:
+  python -m scripts.schema_manager report --save bytes_before.json
+  python -m scripts.schema_manager apply
+  python -m scripts.schema_manager report --compare bytes_before.json
+"""
+import argparse, json, os
+from datetime import date, timedelta
+from typing import NamedTuple, Tuple
+from google.cloud import bigquery
+from scripts.instrumentation import init_tracing
+
+class TableSpec(NamedTuple):
+    columns: Tuple[Tuple[str, str], ...]
+    partition_field: str
+    cluster_by: Tuple[str, ...]
+
+TABLES = {
+    "fact_pick": TableSpec(
+        (("event_ts", "TIMESTAMP"), ("order_id", "STRING"), ("sku", "STRING"),
+         ("qty", "INT64"), ("location_id", "STRING"), ("staff", "STRING")),
+        "event_ts", ("sku", "location_id")),
+    "fact_receipt": TableSpec(
+        (("event_ts", "TIMESTAMP"), ("sku", "STRING"), ("qty", "INT64"),
+         ("location_id", "STRING"), ("supplier", "STRING")),
+        "event_ts", ("sku",)),
+    "fact_stock_snapshot": TableSpec(
+        (("snapshot_ts", "TIMESTAMP"), ("sku", "STRING"), ("location_id", "STRING"),
+         ("on_hand", "INT64")),
+        "snapshot_ts", ("sku", "location_id")),
+    "demand_forecast": TableSpec(
+        (("date", "DATE"), ("sku", "STRING"), ("predicted_demand", "FLOAT64")),
+        "date", ("sku",)),
+}
+
+# Written by scripts/restock_bq.py and the agent's RestockOrder tool; not partitioned
+ACTION_TABLES = {
+    "restock_orders": (
+        ("id", "STRING"), ("batch_id", "STRING"), ("sku", "STRING"),
+        ("amount", "INT64"), ("status", "STRING"), ("source", "STRING"), ("created_at", "TIMESTAMP")),
+    "pending_actions": (
+        ("id", "STRING"), ("batch_id", "STRING"), ("action_type", "STRING"),
+        ("sku", "STRING"), ("amount", "INT64"), ("status", "STRING"), ("created_at", "TIMESTAMP")),
+}
+
+VELOCITY_LOOKBACK = 30   # days; matches slotting_optimizer's default --lookback
+MV_REFRESH_MINUTES = 60
+DAILY_DEMAND_HISTORY_DAYS = 400   # covers the 180-day training window plus a year of history
+
+def _partition_expr(spec: TableSpec) -> str:
+    kind = dict(spec.columns)[spec.partition_field]
+    return spec.partition_field if kind == "DATE" else f"DATE({spec.partition_field})"
+
+def table_clauses(name: str) -> str:
+    """PARTITION BY / CLUSTER BY clause for a managed table ("" if unmanaged).
+
+    CREATE OR REPLACE TABLE must repeat the existing spec, so writers of
+    managed tables append this to their DDL.
+    """
+    spec = TABLES.get(name)
+    if not spec:
+        return ""
+    return f"PARTITION BY {_partition_expr(spec)} CLUSTER BY {', '.join(spec.cluster_by)}"
+
+def get_table(client, table_id):
+    try:
+        return client.get_table(table_id)
+    except Exception:
+        return None
+
+def is_view(client, table_id: str) -> bool:
+    table = get_table(client, table_id)
+    return getattr(table, "table_type", "TABLE") in ("VIEW", "MATERIALIZED_VIEW") if table else False
+
+def _matches(table, spec: TableSpec) -> bool:
+    tp = getattr(table, "time_partitioning", None)
+    return (tp is not None and tp.field == spec.partition_field and tp.type_ == "DAY"
+            and tuple(table.clustering_fields or ()) == spec.cluster_by)
+
+def ensure_table(client, ds: str, name: str, drop_backup: bool = False) -> str:
+    """Create or migrate one managed table. Returns "ok", "created" or "migrated"."""
+    spec = TABLES[name]
+    table = get_table(client, f"{ds}.{name}")
+    if table is not None and _matches(table, spec):
+        return "ok"
+    if table is None:
+        cols = ",\n      ".join(f"{c} {t}" for c, t in spec.columns)
+        client.query(f"""
+        CREATE TABLE IF NOT EXISTS `{ds}.{name}` (
+          {cols}
+        )
+        {table_clauses(name)}
+        """).result()
+        return "created"
+    # Partitioning can't be changed in place: copy, then swap names
+    client.query(f"""
+    CREATE OR REPLACE TABLE `{ds}.{name}__migrating`
+    {table_clauses(name)}
+    AS SELECT * FROM `{ds}.{name}`
+    """).result()
+    client.query(f"ALTER TABLE `{ds}.{name}` RENAME TO `{name}__premigration`").result()
+    client.query(f"ALTER TABLE `{ds}.{name}__migrating` RENAME TO `{name}`").result()
+    if drop_backup:
+        client.query(f"DROP TABLE `{ds}.{name}__premigration`").result()
+    return "migrated"
+
+def ensure_action_table(client, ds: str, name: str) -> str:
+    """Create an action table, or add its missing columns. Returns "ok", "created" or "altered"."""
+    columns = ACTION_TABLES[name]
+    table = get_table(client, f"{ds}.{name}")
+    if table is None:
+        cols = ",\n      ".join(f"{c} {t}" for c, t in columns)
+        client.query(f"CREATE TABLE IF NOT EXISTS `{ds}.{name}` (\n      {cols}\n    )").result()
+        return "created"
+    have = {f.name for f in table.schema}
+    missing = [(c, t) for c, t in columns if c not in have]
+    if not missing:
+        return "ok"
+    adds = ", ".join(f"ADD COLUMN IF NOT EXISTS {c} {t}" for c, t in missing)
+    client.query(f"ALTER TABLE `{ds}.{name}` {adds}").result()
+    return "altered"
+
+def _backup_if_table(client, ds: str, name: str) -> bool:
+    # daily_demand / sku_velocity used to be loaded as plain tables; keep them as
+    # <name>__premigration like ensure_table does. Returns True if renamed.
+    table = get_table(client, f"{ds}.{name}")
+    if table is None or getattr(table, "table_type", "TABLE") != "TABLE":
+        return False
+    client.query(f"ALTER TABLE `{ds}.{name}` RENAME TO `{name}__premigration`").result()
+    return True
+
+def ensure_views(client, ds: str, lookback: int = VELOCITY_LOOKBACK, drop_backups: bool = False):
+    backups = [name for name in ("daily_demand", "sku_velocity") if _backup_if_table(client, ds, name)]
+    since = date.today() - timedelta(days=DAILY_DEMAND_HISTORY_DAYS)
+    client.query(f"""
+    CREATE MATERIALIZED VIEW IF NOT EXISTS `{ds}.daily_demand`
+    PARTITION BY date
+    CLUSTER BY sku
+    OPTIONS (enable_refresh = true, refresh_interval_minutes = {MV_REFRESH_MINUTES})
+    AS
+    SELECT DATE(event_ts) AS date, sku, SUM(qty) AS picks, COUNT(*) AS pick_lines
+    FROM `{ds}.fact_pick`
+    WHERE event_ts >= TIMESTAMP("{since.isoformat()}")
+    GROUP BY date, sku
+    """).result()
+
+    client.query(f"""
+    CREATE OR REPLACE VIEW `{ds}.sku_velocity` AS
+    SELECT sku, SUM(picks) / {lookback} AS picks_per_day
+    FROM `{ds}.daily_demand`
+    WHERE date >= DATE_SUB(CURRENT_DATE(), INTERVAL {lookback} DAY)
+    GROUP BY sku
+    """).result()
+
+    if drop_backups:
+        for name in backups:
+            client.query(f"DROP TABLE `{ds}.{name}__premigration`").result()
+    return backups
+
+def apply(client, ds: str, drop_backups: bool = False):
+    for name in TABLES:
+        print(f"{name:22} {ensure_table(client, ds, name, drop_backups)}")
+    for name in ACTION_TABLES:
+        print(f"{name:22} {ensure_action_table(client, ds, name)}")
+    for name in ensure_views(client, ds, drop_backups=drop_backups):
+        print(f"{name:22} table {'dropped' if drop_backups else f'kept as {name}__premigration'}")
+    print(f"{'daily_demand':22} materialized view (refresh every {MV_REFRESH_MINUTES} min)")
+    print(f"{'sku_velocity':22} view ({VELOCITY_LOOKBACK}-day window over daily_demand)")
+
+# ---- bytes-scanned report ---------------------------------------------------
+# The read side of each existing pipeline query, as it is issued against the
+# current schema. None means the stage issues no query because a materialized
+# view serves it; bytes_report substitutes the view's refresh bytes.
+
+def _report_queries(client, ds):
+    daily_mv = is_view(client, f"{ds}.daily_demand")
+    velocity_view = is_view(client, f"{ds}.sku_velocity")
+    return {
+        "forecast_planner.ensure_daily_demand": None if daily_mv else f"""
+            SELECT DATE(event_ts) AS date, sku, SUM(qty) AS picks
+            FROM `{ds}.fact_pick`
+            WHERE event_ts >= TIMESTAMP_SUB(CURRENT_TIMESTAMP(), INTERVAL 180 DAY)
+            GROUP BY date, sku""",
+        "forecast_planner.bqml_training": f"""
+            SELECT date, sku, picks FROM `{ds}.daily_demand`
+            WHERE date < CURRENT_DATE() AND date >= DATE_SUB(CURRENT_DATE(), INTERVAL 180 DAY)""",
+        "forecast_planner.naive_demand": f"""
+            SELECT sku, DATE(event_ts) AS date, SUM(qty) AS qty
+            FROM `{ds}.fact_pick`
+            WHERE DATE(event_ts) >= DATE_SUB(CURRENT_DATE(), INTERVAL 30 DAY)
+            GROUP BY sku, date""",
+        "forecast_planner.horizon_forecast": f"""
+            SELECT sku, date, predicted_demand FROM `{ds}.demand_forecast`
+            WHERE date >= CURRENT_DATE() AND date < DATE_ADD(CURRENT_DATE(), INTERVAL 14 DAY)""",
+        "slotting_optimizer.velocity": f"SELECT sku, picks_per_day FROM `{ds}.sku_velocity`"
+            if velocity_view else f"""
+            SELECT sku, SUM(qty) / {VELOCITY_LOOKBACK} AS picks_per_day
+            FROM `{ds}.fact_pick`
+            WHERE DATE(event_ts) >= DATE_SUB(CURRENT_DATE(), INTERVAL {VELOCITY_LOOKBACK} DAY)
+            GROUP BY sku""",
+        "pricing_optimizer.forecast_daily": f"""
+            SELECT sku, AVG(predicted_demand) AS daily FROM `{ds}.demand_forecast`
+            WHERE date >= CURRENT_DATE() AND date < DATE_ADD(CURRENT_DATE(), INTERVAL 30 DAY)
+            GROUP BY sku""",
+    }
+
+def mv_refresh_bytes(client, ds: str, name: str, hours: int = 24):
+    """Bytes processed by a materialized view's automatic refreshes in the last `hours`
+    (from INFORMATION_SCHEMA.JOBS_BY_PROJECT; a small real query), or None."""
+    project, dataset = ds.split(".", 1)
+    try:
+        location = client.get_dataset(ds).location.lower()
+        rows = list(client.query(f"""
+          SELECT SUM(total_bytes_processed) AS b
+          FROM `{project}.region-{location}.INFORMATION_SCHEMA.JOBS_BY_PROJECT`
+          WHERE creation_time >= TIMESTAMP_SUB(CURRENT_TIMESTAMP(), INTERVAL {int(hours)} HOUR)
+            AND job_id LIKE 'materialized_view_refresh_%'
+            AND destination_table.dataset_id = '{dataset}'
+            AND destination_table.table_id = '{name}'
+        """).result())
+        return rows[0].b or 0
+    except Exception as e:
+        print(f"{name} refresh bytes: {e}")
+        return None
+
+def bytes_report(client, ds: str) -> dict:
+    """Dry-run each query and return {name: bytes processed} (None if it failed).
+
+    Dry runs reflect partition pruning; clustering savings only show up in
+    the billed bytes of real runs, so the "after" numbers are upper bounds.
+    A stage served by the daily_demand materialized view is charged the view's
+    refresh bytes over the last 24 h (one nightly run's worth), not 0.
+    """
+    cfg = bigquery.QueryJobConfig(dry_run=True, use_query_cache=False)
+    out = {}
+    for name, sql in _report_queries(client, ds).items():
+        if sql is None:
+            out[name] = mv_refresh_bytes(client, ds, "daily_demand")
+            continue
+        try:
+            out[name] = client.query(sql, job_config=cfg).total_bytes_processed
+        except Exception as e:
+            print(f"{name}: {e}")
+            out[name] = None
+    return out
+
+def _fmt(n):
+    return "n/a" if n is None else f"{n / 2**20:,.1f} MiB"
+
+def print_report(after: dict, before: dict = None):
+    print("Dry-run query bytes; ensure_daily_demand shows materialized-view refresh bytes (last 24 h) once migrated.")
+    for name, b in after.items():
+        line = f"{name:38} {_fmt(b):>14}"
+        if before is not None:
+            a = before.get(name)
+            saved = f"{1 - b / a:6.1%}" if a and b is not None else ""
+            line = f"{name:38} {_fmt(a):>14} -> {_fmt(b):>14}  {saved}"
+        print(line)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", choices=["apply", "report"])
+    parser.add_argument("--project", default=os.getenv("GCP_PROJECT_ID"))
+    parser.add_argument("--dataset", default=os.getenv("BQ_DATASET", "warehouse"))
+    parser.add_argument("--drop-backups", action="store_true", help="apply: drop <table>__premigration after migrating (fact tables and replaced daily_demand/sku_velocity)")
+    parser.add_argument("--save", default=None, help="report: write bytes per query to this JSON file")
+    parser.add_argument("--compare", default=None, help="report: JSON from an earlier --save to diff against")
+    args = parser.parse_args(argv)
+
+    if not args.project:
+        raise SystemExit("Project ID not set. Use --project or export GCP_PROJECT_ID.")
+
+    init_tracing()
+    client = bigquery.Client(project=args.project)
+    ds = f"{args.project}.{args.dataset}"
+
+    if args.command == "apply":
+        apply(client, ds, args.drop_backups)
+        return
+
+    report = bytes_report(client, ds)
+    before = None
+    if args.compare:
+        with open(args.compare) as fh:
+            before = json.load(fh)
+    print_report(report, before)
+    if args.save:
+        with open(args.save, "w") as fh:
+            json.dump(report, fh, indent=2)
+
+if __name__ == "__main__":
+    main()
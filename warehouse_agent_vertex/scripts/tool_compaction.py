@@ -0,0 +1,325 @@
+"""Token-budgeted compaction of agent tool outputs.
+
+Raw tool output goes straight into the agent scratchpad, so one SELECT over
+inventory_plan can add thousands of rows to every later LLM call. Every agent
+tool is wrapped so that its output fits a token budget:
+  - Tabular results (the SQL tool runs the query itself, so column names are known):
+    all-NULL columns are dropped and constant columns become a single note.
+    If the rows fit, they are rendered as a compact table. Otherwise the tool
+    returns the row count, per-column aggregates (min/mean/max/sum, or
+    distinct/top values) and the first rows that fit.
+  - Other text is cut to the budget, keeping the head and the tail.
+Whenever output is cut, the full result goes into an in-process side store,
+and the reply names a handle the agent can page through with the ResultPage
+tool ("<handle> <offset>").
+
+token_budget() bounds prompt tokens per agent run (AGENT_TOKEN_BUDGET). It
+counts the usage Gemini reports after each call, or estimates from prompt
+size, and stops the run with BudgetExceeded before a call would go over. As
+the budget runs down, each tool's output allowance shrinks with it. Tokens are
+estimated at ~4 characters each; no tokenizer round trip.
+"""
+import contextlib, contextvars, functools, itertools, threading, uuid
+from collections import Counter, OrderedDict
+from decimal import Decimal
+from scripts.config import config
+from scripts.instrumentation import _callback_base, _token_usage, span
+
+CHARS_PER_TOKEN = 4
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+# ---- side store -------------------------------------------------------------
+
+class ResultStore:
+    """LRU of full tool results: handle -> (columns, rows), or (None, lines) for plain text."""
+
+    def __init__(self, max_items: int = None):
+        self.max_items = max_items or config.TOOL_STORE_MAX
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, columns, rows) -> str:
+        handle = "r" + uuid.uuid4().hex[:6]
+        with self._lock:
+            self._items[handle] = (columns, rows)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+        return handle
+
+    def get(self, handle):
+        with self._lock:
+            item = self._items.get(handle)
+            if item is not None:
+                self._items.move_to_end(handle)
+            return item
+
+store = ResultStore()
+
+# ---- budget -----------------------------------------------------------------
+
+class BudgetExceeded(RuntimeError):
+    pass
+
+class TokenBudget:
+    def __init__(self, limit: int = None):
+        self.limit = limit or config.AGENT_TOKEN_BUDGET
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.llm_calls = 0
+        self._pending = 0   # estimate for the in-flight call, replaced by reported usage
+
+    @property
+    def remaining(self) -> int:
+        return max(0, self.limit - self.prompt_tokens)
+
+    def tool_allowance(self) -> int:
+        """Tokens one tool output may use: the configured cap, less as the run nears its budget."""
+        return max(100, min(config.TOOL_OUTPUT_TOKENS, self.remaining // 4))
+
+    def before_call(self, prompt_chars: int):
+        estimate = prompt_chars // CHARS_PER_TOKEN
+        if self.prompt_tokens + estimate > self.limit:
+            raise BudgetExceeded(
+                f"Stopped: the next model call (~{estimate} prompt tokens) would exceed the "
+                f"{self.limit}-token budget for this question ({self.prompt_tokens} used over "
+                f"{self.llm_calls} calls). Ask a narrower question or raise AGENT_TOKEN_BUDGET.")
+        self._pending = estimate
+
+    def after_call(self, usage: dict):
+        self.llm_calls += 1
+        self.prompt_tokens += usage.get("prompt_tokens") or self._pending
+        self.completion_tokens += usage.get("completion_tokens") or 0
+        self._pending = 0
+
+    def callback(self):
+        Base = _callback_base()
+        budget = self
+
+        class BudgetCallbackHandler(Base):
+            raise_error = True   # let BudgetExceeded stop the agent
+
+            def on_llm_start(self, serialized, prompts, **kw):
+                budget.before_call(sum(len(p) for p in prompts))
+
+            def on_chat_model_start(self, serialized, messages, **kw):
+                budget.before_call(sum(len(str(m.content)) for batch in messages for m in batch))
+
+            def on_llm_end(self, response, **kw):
+                budget.after_call(_token_usage(response))
+
+        return BudgetCallbackHandler()
+
+_budget = contextvars.ContextVar("warehouse_token_budget", default=None)
+
+@contextlib.contextmanager
+def token_budget(limit: int = None):
+    """Scope one agent run: `with token_budget() as b: agent.run(q, callbacks=[b.callback()])`."""
+    budget = TokenBudget(limit)
+    token = _budget.set(budget)
+    with span("budget", "agent_run", limit=budget.limit) as s:
+        try:
+            yield budget
+        finally:
+            s.set(prompt_tokens=budget.prompt_tokens, completion_tokens=budget.completion_tokens,
+                  llm_calls=budget.llm_calls)
+            _budget.reset(token)
+
+def tool_allowance() -> int:
+    budget = _budget.get()
+    return budget.tool_allowance() if budget else config.TOOL_OUTPUT_TOKENS
+
+# ---- rendering --------------------------------------------------------------
+
+def _cell(v) -> str:
+    if v is None:
+        return ""
+    if isinstance(v, float):
+        return f"{v:.4g}"
+    return str(v)
+
+def _numeric(v) -> bool:
+    return isinstance(v, (int, float, Decimal)) and not isinstance(v, bool)
+
+def _prune(columns, rows):
+    """Drop all-NULL columns; fold constant columns into notes. Returns (keep_idx, notes)."""
+    keep, notes = [], []
+    for i, col in enumerate(columns):
+        values = {_cell(r[i]) for r in rows}
+        if values == {""}:
+            notes.append(f"{col}: all NULL")
+        elif len(values) == 1 and len(rows) > 1:
+            notes.append(f"{col} = {values.pop()} for every row")
+        else:
+            keep.append(i)
+    return keep, notes
+
+def _column_summary(col, values) -> str:
+    present = [v for v in values if v is not None]
+    nulls = len(values) - len(present)
+    null_note = f", {nulls} null" if nulls else ""
+    if present and all(_numeric(v) for v in present):
+        nums = [float(v) for v in present]
+        return (f"{col}: min {min(nums):.4g}, mean {sum(nums) / len(nums):.4g}, "
+                f"max {max(nums):.4g}, sum {sum(nums):.4g}{null_note}")
+    counts = Counter(_cell(v) for v in present)
+    top = ", ".join(f"{k} ({n})" for k, n in counts.most_common(3))
+    return f"{col}: {len(counts)} distinct{null_note}; top {top}"
+
+def _fit(text: str, budget_tokens: int) -> str:
+    """text cut to budget_tokens, marked with "..." when cut."""
+    if estimate_tokens(text) <= budget_tokens:
+        return text
+    return text[: max(0, budget_tokens * CHARS_PER_TOKEN - 4)] + " ..."
+
+def _render_rows(columns, rows, budget_tokens, min_rows: int = 1):
+    """Header plus as many rows as fit in budget_tokens (at least min_rows). Returns (text, rows_shown)."""
+    lines = [" | ".join(columns)]
+    used = estimate_tokens(lines[0])
+    shown = 0
+    for r in rows:
+        line = " | ".join(_cell(v) for v in r)
+        cost = estimate_tokens(line)
+        if used + cost > budget_tokens and shown >= min_rows:
+            break
+        lines.append(line)
+        used += cost
+        shown += 1
+    return "\n".join(lines), shown
+
+def compact_table(columns, rows, budget_tokens: int = None) -> str:
+    budget_tokens = budget_tokens or tool_allowance()
+    columns, rows = list(columns), [tuple(r) for r in rows]
+    if not rows:
+        return f"0 rows (columns: {', '.join(columns)})"
+    keep, notes = _prune(columns, rows)
+    kept_cols = [columns[i] for i in keep]
+    kept_rows = [tuple(r[i] for i in keep) for r in rows]
+    note_text = ("; ".join(notes) + "\n") if notes else ""
+
+    full, shown = _render_rows(kept_cols, kept_rows, budget_tokens - estimate_tokens(note_text))
+    if shown == len(rows):
+        return f"{len(rows)} rows\n{note_text}{full}"
+
+    # Summary: count + handle, notes, per-column aggregates for as many columns as
+    # fit in about half the allowance (the rest by name), then the first rows
+    handle = store.put(kept_cols, kept_rows)   # pruned columns are described in the notes
+    parts = [f"{len(rows)} rows (full result stored as {handle}, page with ResultPage '{handle} <offset>')"]
+    used = estimate_tokens(parts[0])
+    if note_text:
+        parts.append(_fit(note_text.strip(), budget_tokens // 4))
+        used += estimate_tokens(parts[-1])
+    summary_budget = budget_tokens // 2
+    summarised = 0
+    for j, c in enumerate(kept_cols):
+        line = _column_summary(c, [r[j] for r in kept_rows])
+        # keep room to at least name the columns that follow
+        names_left = estimate_tokens(", ".join(kept_cols[j + 1:])) + 5 if j + 1 < len(kept_cols) else 0
+        if used + estimate_tokens(line) + names_left > summary_budget:
+            break
+        parts.append(line)
+        used += estimate_tokens(line)
+        summarised += 1
+    if summarised < len(kept_cols):
+        more = " more" if summarised else ""
+        rest = f"{len(kept_cols) - summarised}{more} columns: " + ", ".join(kept_cols[summarised:])
+        parts.append(_fit(rest, max(10, summary_budget - used)))
+        used += estimate_tokens(parts[-1])
+    table, shown = _render_rows(kept_cols, kept_rows, budget_tokens - used - 12, min_rows=0)
+    if shown:
+        parts.append(table)
+    parts.append(f"... {len(rows) - shown} more rows in {handle}")
+    return "\n".join(parts)
+
+def compact_text(text: str, budget_tokens: int = None) -> str:
+    budget_tokens = budget_tokens or tool_allowance()
+    if estimate_tokens(text) <= budget_tokens:
+        return text
+    lines = text.splitlines() or [text]
+    handle = store.put(None, lines)
+    keep = budget_tokens * CHARS_PER_TOKEN
+    head, tail = text[: keep * 3 // 4], text[-(keep // 4):]
+    return (f"{head}\n... [{len(text) - len(head) - len(tail)} chars omitted; full output stored as "
+            f"{handle}, {len(lines)} lines, page with ResultPage '{handle} <line offset>'] ...\n{tail}")
+
+def page(payload: str) -> str:
+    """ResultPage tool: '<handle> [offset]' -> next rows/lines that fit the budget."""
+    parts = payload.replace(",", " ").split()
+    if not parts:
+        return "Usage: '<handle> [offset]'"
+    item = store.get(parts[0].strip("'\""))
+    if item is None:
+        return f"No stored result {parts[0]} (results are kept for the last {store.max_items} tool calls)."
+    offset = int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else 0
+    columns, rows = item
+    if columns is None:
+        text, used, n = [], 0, 0
+        for line in itertools.islice(rows, offset, None):
+            cost = estimate_tokens(line)
+            if used + cost > tool_allowance() and n:
+                break
+            text.append(line)
+            used += cost
+            n += 1
+        return f"lines {offset}-{offset + n - 1} of {len(rows)}\n" + "\n".join(text)
+    table, shown = _render_rows(columns, rows[offset:], tool_allowance())
+    return f"rows {offset}-{offset + shown - 1} of {len(rows)}\n{table}"
+
+# ---- tool wrappers ----------------------------------------------------------
+
+def compact_tool(tool):
+    """Wrap a LangChain tool so its text output is cut to the current tool allowance."""
+    if getattr(tool, "_warehouse_compacted", False):
+        return tool
+    func = getattr(tool, "func", None)
+    if func is not None:
+        @functools.wraps(func)
+        def compacted_func(*args, **kwargs):
+            return compact_text(str(func(*args, **kwargs)))
+        tool.func = compacted_func
+    else:
+        run = tool._run
+
+        @functools.wraps(run)
+        def compacted_run(*args, **kwargs):
+            return compact_text(str(run(*args, **kwargs)))
+        object.__setattr__(tool, "_run", compacted_run)
+    object.__setattr__(tool, "_warehouse_compacted", True)
+    return tool
+
+def compact_sql_tool(tool, engine):
+    """Run the SQL toolkit's query tool on `engine` directly so results keep their
+    column names and compact as tables."""
+    from sqlalchemy import text
+
+    def run_query(query: str, *args, **kwargs):
+        try:
+            with engine.connect() as conn:
+                result = conn.execute(text(query))
+                if not result.returns_rows:
+                    return "Statement executed."
+                return compact_table(list(result.keys()), result.fetchall())
+        except Exception as e:
+            return f"Error: {e}"
+    object.__setattr__(tool, "_run", run_query)
+    object.__setattr__(tool, "_warehouse_compacted", True)
+    return tool
+
+def page_tool():
+    from langchain.agents import Tool
+    return Tool(
+        name="ResultPage",
+        func=page,
+        description="Read more of a large tool result that was summarized: input '<handle> <offset>'"
+    )
+
+def compact_tools(tools: list, engine=None) -> list:
+    """Compact every tool's output and add the ResultPage tool."""
+    out = []
+    for t in tools:
+        if engine is not None and t.name == "sql_db_query":
+            out.append(compact_sql_tool(t, engine))
+        else:
+            out.append(compact_tool(t))
+    return out + [page_tool()]
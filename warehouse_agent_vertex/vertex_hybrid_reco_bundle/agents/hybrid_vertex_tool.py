@@ -2,6 +2,7 @@
 from langchain.tools import Tool
 from google.cloud import bigquery
 from scripts.config import config
+from scripts.instrumentation import instrument_tool
 
 _client = bigquery.Client(project=config.GCP_PROJECT_ID)
 
@@ -68,8 +69,8 @@ def hybrid_vertex_cross_sell(sku: str, top_n: int = 5) -> str:
     items = _hybrid_vertex_query(sku, top_n, w_bpr=0.55, w_emb=0.45)
     return "Hybrid (BPR + VertexEmb) cross-sell for {}: {}".format(sku, ", ".join(items) if items else "no candidates")
 
-HybridVertexCrossSell = Tool(
+HybridVertexCrossSell = instrument_tool(Tool(
     name="HybridVertexCrossSell",
     func=hybrid_vertex_cross_sell,
     description="Hybrid cross-sell using custom BPR vectors and Vertex text embeddings. Input: SKU"
-)
+))
@@ -3,6 +3,7 @@
 from langchain.tools import Tool
 from google.cloud import bigquery
 from scripts.config import config
+from scripts.instrumentation import instrument_tool
 
 _client = bigquery.Client(project=config.GCP_PROJECT_ID)
 
@@ -71,8 +72,8 @@ def hybrid_vertex_cross_sell(sku: str, top_n: int = 5) -> str:
     items = _hybrid_vertex_query(sku, top_n, w_bpr=0.6, w_emb=0.4)
     return f"Vertex-hybrid cross-sell for {sku}: " + (", ".join(items) if items else "no candidates")
 
-VertexHybridCrossSell = Tool(
+VertexHybridCrossSell = instrument_tool(Tool(
     name="VertexHybridCrossSell",
     func=hybrid_vertex_cross_sell,
     description="Custom BPR + Vertex text-embedding hybrid cross-sell. Input: SKU"
-)
+))
@@ -12,6 +12,7 @@ import argparse, os
 import numpy as np
 from google.cloud import bigquery
 from scripts.config import config
+from scripts.instrumentation import init_tracing
 
 try:
     from vertexai import init as vertex_init
@@ -39,13 +40,13 @@ def build_text(row: dict) -> str:
         txt = str(row.get("sku") or "")
     return txt
 
-def main():
+def main(argv=None):
     ap = argparse.ArgumentParser()
     ap.add_argument("--project", default=None)
     ap.add_argument("--dataset", default="whadb")
     ap.add_argument("--model", default=os.getenv("VERTEX_EMBED_MODEL","text-embedding-004"))
     ap.add_argument("--batch", type=int, default=32)
-    args = ap.parse_args()
+    args = ap.parse_args(argv)
 
     project = args.project or getattr(config, "GCP_PROJECT_ID", None)
     dataset = args.dataset or getattr(config, "BQ_DATASET", "whadb")
@@ -55,6 +56,7 @@ def main():
     if not location:
         raise SystemExit("VERTEX_LOCATION not set. export VERTEX_LOCATION=us-central1")
 
+    init_tracing()
     vertex_init(project=project, location=location)
     bq = bigquery.Client(project=project)
 
@@ -11,6 +11,7 @@ Creates:
 import argparse, math, os, sys
 from typing import List
 from google.cloud import bigquery
+from scripts.instrumentation import init_tracing
 
 # Try modern Vertex SDK first, then fallback
 def _get_model(model_name: str):
@@ -54,7 +55,7 @@ def _embed_batch(model, texts: List[str]):
             out.append([float(x) for x in vec])
         return out
 
-def main():
+def main(argv=None):
     ap = argparse.ArgumentParser()
     ap.add_argument("--project", help="BigQuery project id (tables live here)")
     ap.add_argument("--dataset", default="whadb")
@@ -62,7 +63,7 @@ def main():
     ap.add_argument("--vertex-location", default=os.getenv("VERTEX_LOCATION","us-central1"))
     ap.add_argument("--model", default="text-embedding-004")
     ap.add_argument("--batch", type=int, default=96)
-    args = ap.parse_args()
+    args = ap.parse_args(argv)
 
     bq_project = args.project or os.getenv("GCP_PROJECT_ID")
     if not bq_project:
@@ -76,6 +77,7 @@ def main():
     except Exception as e:
         raise SystemExit(f"Failed to init Vertex AI: {e}")
 
+    init_tracing()
     which, model = _get_model(args.model)
 
     client = bigquery.Client(project=bq_project)
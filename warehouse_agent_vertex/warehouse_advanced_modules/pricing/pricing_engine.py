@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""Vectorized price scenario engine.
+
+Every SKU is priced against the same grid of candidate multipliers at once:
+prices, demand, revenue and margin are (n_skus, n_candidates) NumPy arrays,
+so the whole catalog is scored in a handful of array operations.
+
+- Elasticity is estimated per SKU from (price, daily picks) history with a
+  log-log regression shrunk toward a prior, so thin histories stay sane.
+- Demand at a candidate price: base_daily * multiplier ** elasticity.
+- Business rules are callables returning a boolean (n_skus, n_candidates)
+  mask of allowed candidates; the engine ANDs them together.
+"""
+from typing import Callable, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+
+class ScenarioGrid(NamedTuple):
+    """One block of SKUs evaluated against every candidate price."""
+    price: np.ndarray        # (n, g) candidate prices
+    multiplier: np.ndarray   # (g,)   price / current_price
+    base_price: np.ndarray   # (n,)
+    unit_cost: np.ndarray    # (n,)
+    on_hand: np.ndarray      # (n,)
+    demand: np.ndarray       # (n, g) expected daily demand
+    units: np.ndarray        # (n, g) units sold over the horizon (capped by on_hand)
+    revenue: np.ndarray      # (n, g)
+    margin: np.ndarray       # (n, g)
+    cover: np.ndarray        # (n, g) days of cover at the candidate price
+
+
+Rule = Callable[[ScenarioGrid], np.ndarray]
+
+
+def candidate_grid(max_change: float = 0.3, steps: int = 61) -> np.ndarray:
+    """Evenly spaced price multipliers around 1.0 (always includes 1.0 for odd steps)."""
+    return np.linspace(1.0 - max_change, 1.0 + max_change, steps)
+
+
+def estimate_elasticity(sku_codes: np.ndarray, price: np.ndarray, qty: np.ndarray,
+                        n_skus: int, prior: float = -1.5, strength: float = 5.0,
+                        bounds=(-5.0, -0.05)) -> np.ndarray:
+    """Per-SKU log-log slope of qty on price, shrunk toward `prior`.
+
+    `sku_codes` are integer codes 0..n_skus-1 (one per observation). Sums are
+    grouped with np.bincount, so this is O(observations) with no Python loop.
+    SKUs without price variation simply get the prior.
+    """
+    ok = (price > 0) & (qty > 0)
+    codes = sku_codes[ok]
+    lp = np.log(price[ok])
+    lq = np.log(qty[ok])
+
+    n = np.bincount(codes, minlength=n_skus).astype(float)
+    safe_n = np.maximum(n, 1.0)
+    mean_p = np.bincount(codes, lp, n_skus) / safe_n
+    mean_q = np.bincount(codes, lq, n_skus) / safe_n
+    dp = lp - mean_p[codes]
+    dq = lq - mean_q[codes]
+    sxx = np.bincount(codes, dp * dp, n_skus)
+    sxy = np.bincount(codes, dp * dq, n_skus)
+
+    # Ridge toward the prior: (sxy + k*prior) / (sxx + k)
+    slope = (sxy + strength * prior) / (sxx + strength)
+    return np.clip(slope, bounds[0], bounds[1])
+
+
+def build_scenarios(base_price: np.ndarray, base_daily: np.ndarray, elasticity: np.ndarray,
+                    unit_cost: np.ndarray, on_hand: np.ndarray, multipliers: np.ndarray,
+                    horizon: int) -> ScenarioGrid:
+    price = base_price[:, None] * multipliers[None, :]
+    demand = base_daily[:, None] * np.power(multipliers[None, :], elasticity[:, None])
+    units = np.minimum(demand * horizon, on_hand[:, None])
+    revenue = price * units
+    margin = (price - unit_cost[:, None]) * units
+    with np.errstate(divide="ignore"):
+        cover = np.where(demand > 0, on_hand[:, None] / demand, np.inf)
+    return ScenarioGrid(price, multipliers, base_price, unit_cost, on_hand,
+                        demand, units, revenue, margin, cover)
+
+
+# ---- pluggable rules ------------------------------------------------------
+
+def max_change_rule(pct: float) -> Rule:
+    """Limit the move away from the current price to +/- pct."""
+    return lambda g: np.abs(g.multiplier - 1.0)[None, :] <= pct + 1e-12
+
+
+def min_margin_rule(min_margin_pct: float) -> Rule:
+    """Require (price - cost) / price >= min_margin_pct."""
+    return lambda g: (g.price - g.unit_cost[:, None]) >= min_margin_pct * g.price
+
+
+def price_floor_rule(floor: float) -> Rule:
+    """Never recommend a price below `floor`."""
+    return lambda g: g.price >= floor
+
+
+# ---- solver ---------------------------------------------------------------
+
+def cover_violation(cover: np.ndarray, min_cover: float, max_cover: float) -> np.ndarray:
+    """Days outside the [min_cover, max_cover] band (0 inside it)."""
+    return np.maximum(min_cover - cover, 0.0) + np.maximum(cover - max_cover, 0.0)
+
+
+def optimize(base_price, base_daily, elasticity, unit_cost, on_hand,
+             multipliers: np.ndarray, horizon: int,
+             min_cover: float = 0.0, max_cover: float = np.inf,
+             rules: Sequence[Rule] = (), objective: str = "revenue",
+             block_size: Optional[int] = None, max_cells: int = 20_000_000) -> dict:
+    """Pick the best candidate per SKU subject to the days-of-cover band and rules.
+
+    Processes SKUs in row blocks so that n_block * n_candidates stays under
+    `max_cells`, keeping memory flat for large catalogs. When no candidate
+    lands inside the cover band, the rule-allowed candidate closest to the
+    band wins (deepest markdown for overstock, steepest rise for understock);
+    if the rules themselves allow nothing, the current price is kept.
+
+    Returns a dict of 1-D arrays aligned with the inputs.
+    """
+    if objective not in ("revenue", "margin"):
+        raise ValueError(f"Unknown objective: {objective}")
+
+    base_price = np.asarray(base_price, dtype=float)
+    base_daily = np.asarray(base_daily, dtype=float)
+    elasticity = np.asarray(elasticity, dtype=float)
+    unit_cost = np.asarray(unit_cost, dtype=float)
+    on_hand = np.asarray(on_hand, dtype=float)
+    multipliers = np.asarray(multipliers, dtype=float)
+
+    n, g = len(base_price), len(multipliers)
+    block = block_size or max(1, max_cells // max(g, 1))
+    neutral = int(np.argmin(np.abs(multipliers - 1.0)))
+
+    best_idx = np.empty(n, dtype=np.int64)
+    feasible_any = np.empty(n, dtype=bool)
+    out_cols = {k: np.empty(n) for k in ("price", "daily", "revenue", "margin", "cover")}
+
+    for lo in range(0, n, block):
+        hi = min(lo + block, n)
+        grid = build_scenarios(base_price[lo:hi], base_daily[lo:hi], elasticity[lo:hi],
+                               unit_cost[lo:hi], on_hand[lo:hi], multipliers, horizon)
+        allowed = np.ones(grid.price.shape, dtype=bool)
+        for rule in rules:
+            allowed &= rule(grid)
+        violation = cover_violation(grid.cover, min_cover, max_cover)
+        feasible = allowed & (violation == 0)
+
+        score = grid.revenue if objective == "revenue" else grid.margin
+        idx = np.argmax(np.where(feasible, score, -np.inf), axis=1)
+        nearest = np.argmin(np.where(allowed, violation, np.inf), axis=1)
+        ok = feasible.any(axis=1)
+        idx = np.where(ok, idx, np.where(allowed.any(axis=1), nearest, neutral))
+        # No demand signal: nothing to optimize, keep the current price
+        idx = np.where(base_daily[lo:hi] > 0, idx, neutral)
+
+        rows = np.arange(hi - lo)
+        best_idx[lo:hi] = idx
+        feasible_any[lo:hi] = ok
+        out_cols["price"][lo:hi] = grid.price[rows, idx]
+        out_cols["daily"][lo:hi] = grid.demand[rows, idx]
+        out_cols["revenue"][lo:hi] = grid.revenue[rows, idx]
+        out_cols["margin"][lo:hi] = grid.margin[rows, idx]
+        out_cols["cover"][lo:hi] = grid.cover[rows, idx]
+
+    return {
+        "candidate_idx": best_idx,
+        "multiplier": multipliers[best_idx],
+        "feasible": feasible_any,
+        "recommended_price": out_cols["price"],
+        "expected_daily_demand": out_cols["daily"],
+        "expected_revenue": out_cols["revenue"],
+        "expected_margin": out_cols["margin"],
+        "days_of_cover": out_cols["cover"],
+    }
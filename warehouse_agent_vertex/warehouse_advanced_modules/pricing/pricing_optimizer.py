@@ -2,30 +2,52 @@
 #!/usr/bin/env python3
 """Dynamic Pricing & Promotion Optimizer
 Calculates days-of-cover and writes price_recommendations.
+
+Default engine ("scenario") estimates per-SKU price elasticity from pick
+history and scores a grid of candidate prices for every SKU in NumPy
+(see pricing_engine.py). "heuristic" keeps the original +/-10% SQL rule.
+
 Usage:
   python pricing_optimizer.py --project <id> --dataset whadb --days-cover 30
+  python pricing_optimizer.py --project <id> --objective margin --max-change 0.2 --steps 401
+  python pricing_optimizer.py --project <id> --engine heuristic
 """
 import argparse, os
+import numpy as np
+import pandas as pd
 from google.cloud import bigquery
 import math
 
-def main():
-    parser = argparse.ArgumentParser()
-    parser.add_argument('--project', required=True)
-    parser.add_argument('--dataset', default='whadb')
-    parser.add_argument('--days-cover', type=int, default=30)
-    args = parser.parse_args()
+try:
+    from scripts.pricing_engine import (candidate_grid, estimate_elasticity, optimize,
+                                        max_change_rule, min_margin_rule, price_floor_rule)
+except ImportError:
+    from pricing_engine import (candidate_grid, estimate_elasticity, optimize,
+                                max_change_rule, min_margin_rule, price_floor_rule)
+
+try:
+    from scripts.instrumentation import init_tracing
+except ImportError:
+    def init_tracing():
+        pass
 
-    client = bigquery.Client(project=args.project)
-    ds = f"{args.project}.{args.dataset}"
 
+def table_exists(client: bigquery.Client, table_id: str) -> bool:
+    try:
+        client.get_table(table_id)
+        return True
+    except Exception:
+        return False
+
+
+def run_heuristic(client, ds, days_cover):
     sql = f"""
     CREATE OR REPLACE TABLE `{ds}.price_recommendations` AS
     WITH joined AS (
       SELECT p.sku,
              p.current_price,
              i.on_hand,
-             COALESCE(f.daily, 0) * {args.days_cover} AS target_stock,
+             COALESCE(f.daily, 0) * {days_cover} AS target_stock,
              COALESCE(f.daily, 0) AS daily
       FROM `{ds}.dim_product` p
       LEFT JOIN `{ds}.inventory_plan` i USING(sku)
@@ -48,6 +70,141 @@ def main():
     FROM joined;
     """
     client.query(sql).result()
+
+
+def load_inputs(client, ds, cost_ratio):
+    """One row per SKU: current price, unit cost, on_hand and forecast daily demand."""
+    cols = {f.name for f in client.get_table(f"{ds}.dim_product").schema}
+    cost_expr = (f"COALESCE(p.unit_cost, p.current_price * {cost_ratio})"
+                 if "unit_cost" in cols else f"p.current_price * {cost_ratio}")
+    return client.query(f"""
+      SELECT p.sku,
+             p.current_price,
+             {cost_expr} AS unit_cost,
+             COALESCE(i.on_hand, 0) AS on_hand,
+             COALESCE(f.daily, 0) AS daily
+      FROM `{ds}.dim_product` p
+      LEFT JOIN `{ds}.inventory_plan` i USING(sku)
+      LEFT JOIN (
+        SELECT sku, AVG(predicted_demand) AS daily
+        FROM `{ds}.demand_forecast`
+        WHERE date >= CURRENT_DATE() AND date < DATE_ADD(CURRENT_DATE(), INTERVAL 30 DAY)
+        GROUP BY sku
+      ) f USING(sku)
+      WHERE p.current_price > 0
+    """).to_dataframe(create_bqstorage_client=True)
+
+
+def load_price_history(client, ds, table, lookback):
+    """Daily picks joined to the price in effect that day (sku, price, qty)."""
+    if not table_exists(client, f"{ds}.{table}"):
+        print(f"{table} not found; every SKU uses the prior elasticity.")
+        return None
+    return client.query(f"""
+      SELECT d.sku, h.price, d.qty
+      FROM (
+        SELECT sku, DATE(event_ts) AS date, SUM(qty) AS qty
+        FROM `{ds}.fact_pick`
+        WHERE DATE(event_ts) >= DATE_SUB(CURRENT_DATE(), INTERVAL {lookback} DAY)
+        GROUP BY sku, date
+      ) d
+      JOIN `{ds}.{table}` h ON h.sku = d.sku AND h.date = d.date
+    """).to_dataframe(create_bqstorage_client=True)
+
+
+def default_rules(args):
+    """Business rules as vectorized masks; extend this list to add new ones."""
+    rules = [max_change_rule(args.max_change)]
+    if args.min_margin is not None:
+        rules.append(min_margin_rule(args.min_margin))
+    if args.price_floor is not None:
+        rules.append(price_floor_rule(args.price_floor))
+    return rules
+
+
+def run_scenarios(client, ds, args):
+    df = load_inputs(client, ds, args.cost_ratio)
+    if df.empty:
+        raise SystemExit("dim_product has no priced SKUs.")
+
+    elasticity = np.full(len(df), args.prior_elasticity)
+    hist = load_price_history(client, ds, args.price_history_table, args.lookback)
+    if hist is not None and not hist.empty:
+        codes = pd.Categorical(hist["sku"], categories=df["sku"]).codes
+        keep = codes >= 0
+        elasticity = estimate_elasticity(
+            codes[keep].astype(np.int64),
+            hist["price"].to_numpy(float)[keep],
+            hist["qty"].to_numpy(float)[keep],
+            n_skus=len(df), prior=args.prior_elasticity,
+        )
+
+    result = optimize(
+        base_price=df["current_price"].to_numpy(float),
+        base_daily=df["daily"].to_numpy(float),
+        elasticity=elasticity,
+        unit_cost=df["unit_cost"].to_numpy(float),
+        on_hand=df["on_hand"].to_numpy(float),
+        multipliers=candidate_grid(args.max_change, args.steps),
+        horizon=args.days_cover,
+        min_cover=args.days_cover * 0.5,
+        max_cover=args.days_cover * 1.5,
+        rules=default_rules(args),
+        objective=args.objective,
+    )
+
+    out = pd.DataFrame({
+        "sku": df["sku"],
+        "current_price": df["current_price"],
+        "recommended_price": np.round(result["recommended_price"], 2),
+        "on_hand": df["on_hand"],
+        "target_stock": df["daily"] * args.days_cover,
+        "elasticity": elasticity,
+        "expected_daily_demand": result["expected_daily_demand"],
+        "expected_revenue": result["expected_revenue"],
+        "expected_margin": result["expected_margin"],
+        "days_of_cover": np.where(np.isfinite(result["days_of_cover"]),
+                                  result["days_of_cover"], None),
+        "cover_feasible": result["feasible"],
+        "objective": args.objective,
+    })
+    job = client.load_table_from_dataframe(
+        out, f"{ds}.price_recommendations",
+        job_config=bigquery.LoadJobConfig(write_disposition="WRITE_TRUNCATE"),
+    )
+    job.result()
+    print(f"Scored {len(out)} SKUs x {args.steps} candidate prices.")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--project', required=True)
+    parser.add_argument('--dataset', default='whadb')
+    parser.add_argument('--days-cover', type=int, default=30)
+    parser.add_argument('--engine', choices=['scenario', 'heuristic'], default='scenario')
+    parser.add_argument('--objective', choices=['revenue', 'margin'], default='revenue')
+    parser.add_argument('--max-change', type=float, default=0.3, help='max +/- fraction from current price')
+    parser.add_argument('--steps', type=int, default=61, help='candidate prices per SKU')
+    parser.add_argument('--min-margin', type=float, default=None, help='e.g. 0.15 for 15%% min margin')
+    parser.add_argument('--price-floor', type=float, default=None)
+    parser.add_argument('--cost-ratio', type=float, default=0.6, help='unit cost as share of price when dim_product has no unit_cost')
+    parser.add_argument('--prior-elasticity', type=float, default=-1.5)
+    parser.add_argument('--price-history-table', default='price_history', help='(sku, date, price)')
+    parser.add_argument('--lookback', type=int, default=180, help='days of picks for elasticity')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    init_tracing()
+    client = bigquery.Client(project=args.project)
+    ds = f"{args.project}.{args.dataset}"
+
+    if args.engine == 'heuristic':
+        run_heuristic(client, ds, args.days_cover)
+    else:
+        run_scenarios(client, ds, args)
     print("price_recommendations refreshed.")
 
 if __name__ == "__main__":
@@ -1,9 +1,10 @@
 
 from langchain.tools import Tool
+from scripts.instrumentation import instrument_tool
 from scripts.pricing_optimizer import main as run_pricing
 
-PriceAdvisor = Tool(
+PriceAdvisor = instrument_tool(Tool(
     name="PriceAdvisor",
     func=lambda _: (run_pricing(), "Price recommendations refreshed."),
     description="Recomputes price_recommendations and returns confirmation"
-)
+))
@@ -8,26 +8,45 @@ Run:
 import argparse, os, datetime
 from google.cloud import bigquery
 
-def main():
-    parser = argparse.ArgumentParser()
-    parser.add_argument('--project', required=True)
-    parser.add_argument('--dataset', default='whadb')
-    parser.add_argument('--lookback', type=int, default=30, help='days for velocity')
-    args = parser.parse_args()
+try:
+    from scripts.instrumentation import init_tracing
+except ImportError:
+    def init_tracing():
+        pass
 
-    client = bigquery.Client(project=args.project)
-    ds = f"{args.project}.{args.dataset}"
+try:
+    from scripts.schema_manager import VELOCITY_LOOKBACK, is_view
+except ImportError:
+    VELOCITY_LOOKBACK = 30
+    def is_view(client, table_id):
+        return False
 
+def run(client: bigquery.Client, ds: str, lookback: int = 30):
+    """Refresh slotting_move_list in dataset `ds` ("project.dataset")."""
     # 1. SKU velocity (picks per day)
-    velocity_sql = f"""
-    CREATE OR REPLACE TABLE `{ds}.sku_velocity` AS
-    SELECT sku,
-           SUM(qty) / {args.lookback} AS picks_per_day
-    FROM `{ds}.fact_pick`
-    WHERE DATE(event_ts) >= DATE_SUB(CURRENT_DATE(), INTERVAL {args.lookback} DAY)
-    GROUP BY sku;
-    """
-    client.query(velocity_sql).result()
+    velocity = "sku_velocity"
+    if not is_view(client, f"{ds}.sku_velocity"):
+        velocity_sql = f"""
+        CREATE OR REPLACE TABLE `{ds}.sku_velocity` AS
+        SELECT sku,
+               SUM(qty) / {lookback} AS picks_per_day
+        FROM `{ds}.fact_pick`
+        WHERE DATE(event_ts) >= DATE_SUB(CURRENT_DATE(), INTERVAL {lookback} DAY)
+        GROUP BY sku;
+        """
+        client.query(velocity_sql).result()
+    elif lookback != VELOCITY_LOOKBACK:
+        # sku_velocity is the managed view (fixed window); read the daily_demand view instead
+        velocity = f"sku_velocity_{lookback}d"
+        velocity_sql = f"""
+        CREATE OR REPLACE TABLE `{ds}.{velocity}` AS
+        SELECT sku,
+               SUM(picks) / {lookback} AS picks_per_day
+        FROM `{ds}.daily_demand`
+        WHERE date >= DATE_SUB(CURRENT_DATE(), INTERVAL {lookback} DAY)
+        GROUP BY sku;
+        """
+        client.query(velocity_sql).result()
 
     # 2. Rank locations by travel_cost
     travel_sql = f"""
@@ -45,7 +64,7 @@ def main():
     SELECT v.sku,
            ANY_VALUE(s.location_id) AS cur_loc,
            MIN(l.travel_cost) AS cur_cost
-    FROM `{ds}.sku_velocity` v
+    FROM `{ds}.{velocity}` v
     JOIN `{ds}.fact_stock_snapshot` s USING(sku)
     JOIN `{ds}.loc_rank` l ON l.location_id = s.location_id
     GROUP BY v.sku;
@@ -59,7 +78,7 @@ def main():
       SELECT sku,
              picks_per_day,
              NTILE(100) OVER (ORDER BY picks_per_day DESC) AS velocity_pct
-      FROM `{ds}.sku_velocity`
+      FROM `{ds}.{velocity}`
     )
     SELECT p.sku,
            c.cur_loc,
@@ -78,5 +97,16 @@ def main():
     client.query(desired_sql).result()
     print("slotting_move_list refreshed.")
 
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--project', required=True)
+    parser.add_argument('--dataset', default='whadb')
+    parser.add_argument('--lookback', type=int, default=30, help='days for velocity')
+    args = parser.parse_args(argv)
+
+    init_tracing()
+    client = bigquery.Client(project=args.project)
+    run(client, f"{args.project}.{args.dataset}", args.lookback)
+
 if __name__ == "__main__":
     main()
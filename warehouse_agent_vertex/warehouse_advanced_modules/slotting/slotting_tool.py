@@ -1,9 +1,10 @@
 
 from langchain.tools import Tool
+from scripts.instrumentation import instrument_tool
 from scripts.slotting_optimizer import main as run_slotting
 
-SlottingAdvisor = Tool(
+SlottingAdvisor = instrument_tool(Tool(
     name="SlottingAdvisor",
     func=lambda _: (run_slotting(), "Slotting move list refreshed."),
     description="Recomputes slotting_move_list and returns confirmation"
-)
+))
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""Micro-benchmark: binary Avro vs JSON for pick/receipt events.
+
+Reports bytes per event, encode and decode throughput, and an end-to-end
+produce -> InMemoryTransport -> consume pass for each encoding. No Pub/Sub needed.
+Codec timings are the best of --repeat runs, so one GC pause or noisy
+neighbour does not decide the comparison. "avro-loop" is the same codec with
+the generated record decoder turned off.
+
+Usage:
+  python avro_bench.py --events 200000
+"""
+import argparse, json, random, time
+
+import avro_codec
+from avro_codec import warehouse_codecs
+from event_producer import EventConsumer, EventProducer, InMemoryTransport
+
+
+def synth_events(n: int, seed: int = 7):
+    rnd = random.Random(seed)
+    t0 = 1_760_000_000
+    out = []
+    for i in range(n):
+        ts = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(t0 + i))
+        sku = f"SKU{rnd.randrange(50_000):06d}"
+        if rnd.random() < 0.85:
+            out.append(("PickEvent", {
+                "event_ts": ts, "order_id": f"ORD{i:09d}", "sku": sku,
+                "qty": rnd.randint(1, 6), "location_id": f"A{rnd.randrange(40):02d}-{rnd.randrange(200):03d}",
+                "staff": rnd.choice([None, "picker01", "picker02", "picker17"]),
+            }))
+        else:
+            out.append(("ReceiptEvent", {
+                "event_ts": ts, "sku": sku, "qty": rnd.randint(24, 480),
+                "location_id": f"R{rnd.randrange(10):02d}", "supplier": f"SUP{rnd.randrange(300):03d}",
+            }))
+    return out
+
+
+def timed(fn, repeat: int = 1):
+    """(result, best elapsed seconds) over `repeat` runs."""
+    best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t)
+    return result, best
+
+
+def _loop_codecs():
+    avro_codec.GENERATE_DECODERS = False
+    try:
+        return warehouse_codecs()
+    finally:
+        avro_codec.GENERATE_DECODERS = True
+
+
+def bench_codec(events, repeat: int = 5):
+    codecs, loop_codecs = warehouse_codecs(), _loop_codecs()
+    dumps, loads = json.dumps, json.loads
+
+    json_msgs, t_json_enc = timed(lambda: [dumps(e, separators=(",", ":")).encode() for _, e in events], repeat)
+    _, t_json_dec = timed(lambda: [loads(m) for m in json_msgs], repeat)
+
+    avro_msgs, t_avro_enc = timed(lambda: [codecs[s].encode(e) for s, e in events], repeat)
+    schemas = [s for s, _ in events]
+    _, t_avro_dec = timed(lambda: [codecs[s].decode(m) for s, m in zip(schemas, avro_msgs)], repeat)
+    _, t_loop_dec = timed(lambda: [loop_codecs[s].decode(m) for s, m in zip(schemas, avro_msgs)], repeat)
+
+    n = len(events)
+    avro_bytes = sum(map(len, avro_msgs)) / n
+    return {
+        "json": {"bytes_per_event": sum(map(len, json_msgs)) / n,
+                 "encode_eps": n / t_json_enc, "decode_eps": n / t_json_dec},
+        "avro": {"bytes_per_event": avro_bytes,
+                 "encode_eps": n / t_avro_enc, "decode_eps": n / t_avro_dec},
+        "avro-loop": {"bytes_per_event": avro_bytes,
+                      "encode_eps": n / t_avro_enc, "decode_eps": n / t_loop_dec},
+    }
+
+
+def bench_pipeline(events, encoding: str, max_messages: int):
+    transport = InMemoryTransport()
+    producer = EventProducer(transport, encoding=encoding, max_messages=max_messages)
+    consumer = EventConsumer(transport)
+
+    def run():
+        for schema, e in events:
+            producer.publish(schema, e)
+        producer.close()
+        got = 0
+        while True:
+            batch = consumer.poll(10_000)
+            if not batch:
+                return got
+            got += len(batch)
+
+    got, elapsed = timed(run)
+    assert got == len(events), (got, len(events))
+    return {"events_per_sec": len(events) / elapsed, "publish_calls": transport.publish_calls,
+            "bytes": producer.sent_bytes}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--events", type=int, default=200_000)
+    ap.add_argument("--batch", type=int, default=1000, help="max messages per publish")
+    ap.add_argument("--repeat", type=int, default=5, help="codec timings: best of N runs")
+    args = ap.parse_args()
+
+    events = synth_events(args.events)
+    codec = bench_codec(events, args.repeat)
+    print(f"{'':9} {'bytes/event':>12} {'encode ev/s':>14} {'decode ev/s':>14}")
+    for name, r in codec.items():
+        print(f"{name:9} {r['bytes_per_event']:12.1f} {r['encode_eps']:14,.0f} {r['decode_eps']:14,.0f}")
+    saved = 1 - codec["avro"]["bytes_per_event"] / codec["json"]["bytes_per_event"]
+    print(f"avro saves {saved:.0%} bytes per event")
+
+    print("\nproduce -> in-memory transport -> consume")
+    for enc in ("json", "binary"):
+        r = bench_pipeline(events, enc, args.batch)
+        print(f"{enc:6} {r['events_per_sec']:14,.0f} ev/s  {r['publish_calls']:6} publish calls  {r['bytes']:>12,} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,421 @@
+#!/usr/bin/env python3
+"""Binary Avro codec compiled from the .avsc schemas.
+
+compile_schema() walks a schema once and returns an encoder/decoder pair built
+from nested closures, so encoding an event is a straight run of appends with no
+per-message schema interpretation. Records whose fields are all primitives (or
+["null", primitive]) get a generated straight-line decoder instead, with the
+one-byte varint case inlined; that is what keeps decode close to json.loads.
+
+Covers what the warehouse schemas need plus the common rest of the spec:
+null, boolean, int, long, float, double, bytes, string, record, enum, array,
+map, union, fixed, and the timestamp-millis/-micros logical types.
+
+Usage:
+  from avro_codec import load_codec
+  pick = load_codec("schemas/pick_event.avsc")
+  data = pick.encode({"event_ts": "...", "order_id": "O1", "sku": "A", "qty": 2,
+                      "location_id": None, "staff": None})
+  event = pick.decode(data)
+"""
+import json, os, struct
+from datetime import datetime, timezone
+from typing import Callable, NamedTuple
+
+SCHEMA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "schemas")
+
+_pack_float = struct.Struct("<f").pack
+_pack_double = struct.Struct("<d").pack
+_unpack_float = struct.Struct("<f").unpack_from
+_unpack_double = struct.Struct("<d").unpack_from
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+class Codec(NamedTuple):
+    name: str
+    encode: Callable   # datum -> bytes
+    decode: Callable   # bytes -> datum
+    schema: dict
+
+
+# ---- primitives -------------------------------------------------------------
+
+def _write_long(n: int, buf: bytearray):
+    n = (n << 1) ^ (n >> 63)
+    while n > 0x7F:
+        buf.append((n & 0x7F) | 0x80)
+        n >>= 7
+    buf.append(n)
+
+
+def _read_long(data, pos: int):
+    b = data[pos]
+    pos += 1
+    n = b & 0x7F
+    shift = 7
+    while b & 0x80:
+        b = data[pos]
+        pos += 1
+        n |= (b & 0x7F) << shift
+        shift += 7
+    return (n >> 1) ^ -(n & 1), pos
+
+
+def _write_string(s: str, buf: bytearray):
+    b = s.encode("utf-8")
+    _write_long(len(b), buf)
+    buf += b
+
+
+def _read_string(data, pos: int):
+    n, pos = _read_long(data, pos)
+    end = pos + n
+    return str(data[pos:end], "utf-8"), end
+
+
+def _write_bytes(b: bytes, buf: bytearray):
+    _write_long(len(b), buf)
+    buf += b
+
+
+def _read_bytes(data, pos: int):
+    n, pos = _read_long(data, pos)
+    end = pos + n
+    return bytes(data[pos:end]), end
+
+
+def _write_null(_, buf):
+    pass
+
+
+def _read_null(data, pos):
+    return None, pos
+
+
+def _write_boolean(v, buf):
+    buf.append(1 if v else 0)
+
+
+def _read_boolean(data, pos):
+    return data[pos] == 1, pos + 1
+
+
+def _write_float(v, buf):
+    buf += _pack_float(v)
+
+
+def _read_float(data, pos):
+    return _unpack_float(data, pos)[0], pos + 4
+
+
+def _write_double(v, buf):
+    buf += _pack_double(v)
+
+
+def _read_double(data, pos):
+    return _unpack_double(data, pos)[0], pos + 8
+
+
+_PRIMITIVES = {
+    "null": (_write_null, _read_null),
+    "boolean": (_write_boolean, _read_boolean),
+    "int": (_write_long, _read_long),
+    "long": (_write_long, _read_long),
+    "float": (_write_float, _read_float),
+    "double": (_write_double, _read_double),
+    "bytes": (_write_bytes, _read_bytes),
+    "string": (_write_string, _read_string),
+}
+
+
+# ---- compiler ---------------------------------------------------------------
+
+def _timestamp(scale: int, write, read):
+    """timestamp-millis/-micros: accept datetimes or ISO strings, decode to aware datetimes."""
+    def enc(v, buf):
+        if isinstance(v, str):
+            # fromisoformat only accepts a trailing "Z" from Python 3.11
+            v = datetime.fromisoformat(v[:-1] + "+00:00" if v.endswith(("Z", "z")) else v)
+        if isinstance(v, datetime):
+            if v.tzinfo is None:
+                v = v.replace(tzinfo=timezone.utc)
+            delta = v - _EPOCH
+            v = (delta.days * 86400 + delta.seconds) * scale + delta.microseconds * scale // 1_000_000
+        write(v, buf)
+
+    def dec(data, pos):
+        n, pos = read(data, pos)
+        return datetime.fromtimestamp(n / scale, timezone.utc), pos
+
+    return enc, dec
+
+
+def _union_matches(branch, v) -> bool:
+    t = branch if isinstance(branch, str) else branch.get("type")
+    if t == "null":
+        return v is None
+    if t == "boolean":
+        return isinstance(v, bool)
+    if t in ("int", "long"):
+        if isinstance(branch, dict) and "logicalType" in branch and isinstance(v, (datetime, str)):
+            return True
+        return isinstance(v, int) and not isinstance(v, bool)
+    if t in ("float", "double"):
+        return isinstance(v, (int, float)) and not isinstance(v, bool)
+    if t == "string":
+        return isinstance(v, str)
+    if t in ("bytes", "fixed"):
+        return isinstance(v, (bytes, bytearray))
+    if t in ("record", "map"):
+        return isinstance(v, dict)
+    if t == "array":
+        return isinstance(v, (list, tuple))
+    if t == "enum":
+        return isinstance(v, str)
+    return False
+
+
+def _compile(schema, named: dict):
+    if isinstance(schema, str):
+        if schema in _PRIMITIVES:
+            return _PRIMITIVES[schema]
+        if schema in named:
+            # Late-bound so recursive records work.
+            return (lambda v, buf: named[schema][0](v, buf),
+                    lambda data, pos: named[schema][1](data, pos))
+        raise ValueError(f"Unknown Avro type: {schema}")
+
+    if isinstance(schema, list):
+        return _compile_union(schema, named)
+
+    t = schema["type"]
+    logical = schema.get("logicalType")
+    if t in _PRIMITIVES:
+        write, read = _PRIMITIVES[t]
+        if logical == "timestamp-millis" and t == "long":
+            return _timestamp(1000, write, read)
+        if logical == "timestamp-micros" and t == "long":
+            return _timestamp(1_000_000, write, read)
+        return write, read
+
+    if t == "record":
+        return _compile_record(schema, named)
+
+    if t == "enum":
+        symbols = schema["symbols"]
+        index = {s: i for i, s in enumerate(symbols)}
+        pair = (lambda v, buf: _write_long(index[v], buf),
+                lambda data, pos: (lambda r: (symbols[r[0]], r[1]))(_read_long(data, pos)))
+        named[schema["name"]] = pair
+        return pair
+
+    if t == "fixed":
+        size = schema["size"]
+
+        def enc_fixed(v, buf):
+            if len(v) != size:
+                raise ValueError(f"fixed {schema['name']} expects {size} bytes")
+            buf += v
+        pair = (enc_fixed, lambda data, pos: (bytes(data[pos:pos + size]), pos + size))
+        named[schema["name"]] = pair
+        return pair
+
+    if t == "array":
+        item_enc, item_dec = _compile(schema["items"], named)
+
+        def enc_array(v, buf):
+            if v:
+                _write_long(len(v), buf)
+                for item in v:
+                    item_enc(item, buf)
+            buf.append(0)
+
+        def dec_array(data, pos):
+            out = []
+            n, pos = _read_long(data, pos)
+            while n:
+                if n < 0:  # block with byte size prefix
+                    n = -n
+                    _, pos = _read_long(data, pos)
+                for _ in range(n):
+                    item, pos = item_dec(data, pos)
+                    out.append(item)
+                n, pos = _read_long(data, pos)
+            return out, pos
+        return enc_array, dec_array
+
+    if t == "map":
+        val_enc, val_dec = _compile(schema["values"], named)
+
+        def enc_map(v, buf):
+            if v:
+                _write_long(len(v), buf)
+                for k, item in v.items():
+                    _write_string(k, buf)
+                    val_enc(item, buf)
+            buf.append(0)
+
+        def dec_map(data, pos):
+            out = {}
+            n, pos = _read_long(data, pos)
+            while n:
+                if n < 0:
+                    n = -n
+                    _, pos = _read_long(data, pos)
+                for _ in range(n):
+                    k, pos = _read_string(data, pos)
+                    out[k], pos = val_dec(data, pos)
+                n, pos = _read_long(data, pos)
+            return out, pos
+        return enc_map, dec_map
+
+    raise ValueError(f"Unsupported Avro type: {t}")
+
+
+def _compile_union(branches, named):
+    compiled = [_compile(b, named) for b in branches]
+    encoders = [c[0] for c in compiled]
+    decoders = [c[1] for c in compiled]
+
+    # Fast path for the ubiquitous ["null", X] optional field.
+    if len(branches) == 2 and branches[0] == "null":
+        inner = encoders[1]
+
+        def enc_optional(v, buf):
+            if v is None:
+                buf.append(0)
+            else:
+                buf.append(2)  # zigzag(1)
+                inner(v, buf)
+        enc = enc_optional
+    else:
+        def enc_union(v, buf):
+            for i, b in enumerate(branches):
+                if _union_matches(b, v):
+                    _write_long(i, buf)
+                    encoders[i](v, buf)
+                    return
+            raise ValueError(f"Value {v!r} matches no branch of union {branches}")
+        enc = enc_union
+
+    def dec_union(data, pos):
+        i, pos = _read_long(data, pos)
+        return decoders[i](data, pos)
+
+    return enc, dec_union
+
+
+# Generated decoder for flat records -------------------------------------------
+# Set GENERATE_DECODERS = False before compiling to get the closure decoder only
+# (avro_bench.py compares the two).
+GENERATE_DECODERS = True
+
+# Each snippet reads one value into `v` from data[pos:], advancing pos.
+
+_VARINT = """\
+b = data[pos]; pos += 1
+if b & 0x80:
+    n, pos = _read_long(data, pos - 1)
+else:
+    n = (b >> 1) ^ -(b & 1)
+"""
+_FLAT_READERS = {
+    "int": _VARINT + "v = n\n",
+    "long": _VARINT + "v = n\n",
+    "string": _VARINT + "v = str(data[pos:pos + n], 'utf-8'); pos += n\n",
+    "bytes": _VARINT + "v = bytes(data[pos:pos + n]); pos += n\n",
+    "boolean": "v = data[pos] == 1; pos += 1\n",
+    "float": "v = _unpack_float(data, pos)[0]; pos += 4\n",
+    "double": "v = _unpack_double(data, pos)[0]; pos += 8\n",
+    "null": "v = None\n",
+}
+
+
+def _flat_reader(t):
+    """Source reading one field of type t, or None if t needs the general compiler."""
+    if isinstance(t, dict):
+        if t.get("logicalType"):
+            return None
+        t = t.get("type")
+    if isinstance(t, str):
+        return _FLAT_READERS.get(t)
+    if isinstance(t, list) and len(t) == 2 and t[0] == "null":
+        inner = _flat_reader(t[1])
+        if inner is None:
+            return None
+        body = "".join("    " + line + "\n" for line in inner.splitlines())
+        return f"if data[pos] == 0:\n    pos += 1; v = None\nelse:\n    pos += 1\n{body}"
+    return None
+
+
+def _generate_record_decoder(fields):
+    """Straight-line decoder for a record of primitive/optional fields, else None."""
+    readers = [_flat_reader(f["type"]) for f in fields]
+    if any(r is None for r in readers):
+        return None
+    lines = ["def dec_record(data, pos):"]
+    for i, reader in enumerate(readers):
+        lines += ["    " + line for line in reader.splitlines()]
+        lines.append(f"    f{i} = v")
+    items = ", ".join(f"{f['name']!r}: f{i}" for i, f in enumerate(fields))
+    lines.append(f"    return {{{items}}}, pos")
+    ns = {"_read_long": _read_long, "_unpack_float": _unpack_float, "_unpack_double": _unpack_double}
+    exec("\n".join(lines), ns)
+    return ns["dec_record"]
+
+
+def _compile_record(schema, named):
+    fields = schema["fields"]
+    names = [f["name"] for f in fields]
+    defaults = [f.get("default") for f in fields]
+    placeholder = [None, None]
+    named[schema["name"]] = placeholder  # allow self references while compiling
+    compiled = [_compile(f["type"], named) for f in fields]
+    encoders = list(zip(names, defaults, [c[0] for c in compiled]))
+    decoders = list(zip(names, [c[1] for c in compiled]))
+
+    def enc_record(v, buf):
+        get = v.get
+        for name, default, enc in encoders:
+            enc(get(name, default), buf)
+
+    def _loop_decoder(data, pos):
+        out = {}
+        for name, dec in decoders:
+            out[name], pos = dec(data, pos)
+        return out, pos
+
+    generated = _generate_record_decoder(fields) if GENERATE_DECODERS else None
+    dec_record = generated or _loop_decoder
+    placeholder[0], placeholder[1] = enc_record, dec_record
+    return enc_record, dec_record
+
+
+def compile_schema(schema) -> Codec:
+    if isinstance(schema, str):
+        schema = json.loads(schema)
+    enc, dec = _compile(schema, {})
+
+    def encode(datum) -> bytes:
+        buf = bytearray()
+        enc(datum, buf)
+        return bytes(buf)
+
+    def decode(data):
+        return dec(data, 0)[0]
+
+    return Codec(schema.get("name", "datum"), encode, decode, schema)
+
+
+def load_codec(path: str) -> Codec:
+    with open(path, encoding="utf-8") as fh:
+        return compile_schema(json.load(fh))
+
+
+def warehouse_codecs() -> dict:
+    """{"PickEvent": Codec, "ReceiptEvent": Codec} from streaming/schemas/."""
+    codecs = {}
+    for fname in ("pick_event.avsc", "receipt_event.avsc"):
+        codec = load_codec(os.path.join(SCHEMA_DIR, fname))
+        codecs[codec.name] = codec
+    return codecs
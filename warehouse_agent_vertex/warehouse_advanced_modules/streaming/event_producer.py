@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""Batching producer / consumer for the picking-events and receiving-events topics.
+
+Events are encoded with the precompiled Avro codecs (binary, default) or JSON,
+buffered per topic, and flushed as one transport call when any threshold trips:
+  - max_messages  messages buffered
+  - max_bytes     encoded payload bytes buffered
+  - max_latency   seconds since the oldest buffered message
+
+Transports:
+  - InMemoryTransport: local stand-in for Pub/Sub (benchmarks, tests, dev)
+  - PubSubTransport:   google-cloud-pubsub publisher, one batch per flush
+
+Pub/Sub schema topics validate each message as a single record, so a batch is
+many messages in one publish request, not many records in one message. Set the
+topic encoding to BINARY (pubsub_to_bq_setup.sh <PROJECT> <DATASET> binary).
+"""
+import functools, json, threading, time
+from collections import defaultdict, deque
+
+try:
+    from avro_codec import warehouse_codecs
+except ImportError:
+    from scripts.avro_codec import warehouse_codecs
+
+TOPICS = {"PickEvent": "picking-events", "ReceiptEvent": "receiving-events"}
+ENCODING_ATTR = "googclient_schemaencoding"
+SCHEMA_ATTR = "googclient_schemaname"
+SCHEMAS = {"picking_schema": "PickEvent", "receiving_schema": "ReceiptEvent"}
+
+
+class InMemoryTransport:
+    """Topic -> deque of (data, attributes). Thread-safe enough for one producer/consumer pair."""
+
+    def __init__(self):
+        self.topics = defaultdict(deque)
+        self.publish_calls = 0
+
+    def publish(self, topic: str, messages: list, encoding: str):
+        # Pub/Sub stamps the schema encoding on delivery; mimic that here.
+        self.publish_calls += 1
+        attributes = {ENCODING_ATTR: encoding.upper()}
+        q = self.topics[topic]
+        for m in messages:
+            q.append((m, attributes))
+
+    def pull(self, topic: str, max_messages: int) -> list:
+        q = self.topics[topic]
+        out = []
+        while q and len(out) < max_messages:
+            out.append(q.popleft())
+        return out
+
+
+class PubSubTransport:
+    def __init__(self, project: str, max_messages: int = 1000, max_bytes: int = 1_000_000,
+                 max_latency: float = 0.05):
+        try:
+            from google.cloud import pubsub_v1
+        except Exception as e:
+            raise SystemExit("google-cloud-pubsub not installed. pip install google-cloud-pubsub") from e
+        # Match the client's own batching to ours so each flush is one publish RPC.
+        settings = pubsub_v1.types.BatchSettings(
+            max_messages=max_messages, max_bytes=max_bytes, max_latency=max_latency)
+        self._client = pubsub_v1.PublisherClient(batch_settings=settings)
+        self._project = project
+
+    def publish(self, topic: str, messages: list, encoding: str):
+        # The topic's schema settings decide the encoding; "goog*" attributes are reserved.
+        path = self._client.topic_path(self._project, topic)
+        futures = [self._client.publish(path, m) for m in messages]
+        for f in futures:
+            f.result()
+
+
+class EventProducer:
+    def __init__(self, transport, encoding: str = "binary", max_messages: int = 1000,
+                 max_bytes: int = 1_000_000, max_latency: float = 0.05, background: bool = False):
+        if encoding not in ("binary", "json"):
+            raise ValueError("encoding must be 'binary' or 'json'")
+        self.transport = transport
+        self.encoding = encoding
+        self.max_messages = max_messages
+        self.max_bytes = max_bytes
+        self.max_latency = max_latency
+        self._codecs = warehouse_codecs()
+        self._buf = {t: [] for t in TOPICS.values()}
+        self._size = dict.fromkeys(TOPICS.values(), 0)
+        self._first = dict.fromkeys(TOPICS.values(), 0.0)
+        self._lock = threading.Lock()
+        self.sent_messages = 0
+        self.sent_bytes = 0
+
+        self._stop = threading.Event()
+        self._timer = None
+        if background:
+            # Flush lingering partial batches even when publish() isn't called.
+            self._timer = threading.Thread(target=self._linger, daemon=True)
+            self._timer.start()
+
+    def _encode(self, schema: str, event: dict) -> bytes:
+        if self.encoding == "binary":
+            return self._codecs[schema].encode(event)
+        return json.dumps(event, separators=(",", ":")).encode("utf-8")
+
+    def publish(self, schema: str, event: dict):
+        """schema is "PickEvent" or "ReceiptEvent"."""
+        topic = TOPICS[schema]
+        data = self._encode(schema, event)
+        with self._lock:
+            buf = self._buf[topic]
+            if not buf:
+                self._first[topic] = time.monotonic()
+            buf.append(data)
+            self._size[topic] += len(data)
+            if (len(buf) >= self.max_messages or self._size[topic] >= self.max_bytes
+                    or time.monotonic() - self._first[topic] >= self.max_latency):
+                self._flush_topic(topic)
+
+    def publish_pick(self, event: dict):
+        self.publish("PickEvent", event)
+
+    def publish_receipt(self, event: dict):
+        self.publish("ReceiptEvent", event)
+
+    def _flush_topic(self, topic: str):
+        buf = self._buf[topic]
+        if not buf:
+            return
+        self.transport.publish(topic, buf, self.encoding)
+        self.sent_messages += len(buf)
+        self.sent_bytes += self._size[topic]
+        self._buf[topic] = []
+        self._size[topic] = 0
+
+    def flush(self):
+        with self._lock:
+            for topic in self._buf:
+                self._flush_topic(topic)
+
+    def _linger(self):
+        while not self._stop.wait(self.max_latency):
+            now = time.monotonic()
+            with self._lock:
+                for topic, buf in self._buf.items():
+                    if buf and now - self._first[topic] >= self.max_latency:
+                        self._flush_topic(topic)
+
+    def close(self):
+        self._stop.set()
+        if self._timer:
+            self._timer.join()
+        self.flush()
+
+
+class EventConsumer:
+    """Decodes messages by their encoding attribute; yields event dicts tagged with event_type."""
+
+    def __init__(self, transport: InMemoryTransport):
+        self.transport = transport
+        codecs = warehouse_codecs()
+        self._decoders = {TOPICS[name]: codecs[name].decode for name in TOPICS}
+        self._types = {"picking-events": "pick", "receiving-events": "receipt"}
+
+    def poll(self, max_messages: int = 1000) -> list:
+        out = []
+        for topic, decode in self._decoders.items():
+            etype = self._types[topic]
+            for data, attrs in self.transport.pull(topic, max_messages):
+                if attrs.get(ENCODING_ATTR, "JSON").upper() == "BINARY":
+                    ev = decode(data)
+                else:
+                    ev = json.loads(data)
+                ev["event_type"] = etype
+                out.append(ev)
+        return out
+
+
+@functools.lru_cache(maxsize=None)
+def _codecs() -> dict:
+    return warehouse_codecs()
+
+
+def decode_message(data: bytes, attributes: dict):
+    """Decode one delivered Pub/Sub message using the schema attributes Pub/Sub attaches."""
+    attributes = attributes or {}
+    if attributes.get(ENCODING_ATTR, "JSON").upper() != "BINARY":
+        return json.loads(data)
+    schema_id = attributes.get(SCHEMA_ATTR, "").split("@")[0].rsplit("/", 1)[-1]
+    return _codecs()[SCHEMAS[schema_id]].decode(data)
@@ -1,9 +1,11 @@
 
 #!/usr/bin/env bash
 # Pub/Sub → BigQuery setup script
-# Usage: ./pubsub_to_bq_setup.sh <PROJECT_ID> <DATASET>
+# Usage: ./pubsub_to_bq_setup.sh <PROJECT_ID> <DATASET> [json|binary]
+#   binary: compact Avro messages (see event_producer.py / avro_bench.py)
 PROJECT=$1
 DATASET=$2
+ENCODING=${3:-json}
 
 # Topics
 gcloud pubsub topics create picking-events --project=$PROJECT
@@ -13,12 +15,14 @@ gcloud pubsub topics create receiving-events --project=$PROJECT
 gcloud pubsub schemas create picking_schema --project=$PROJECT --type=avro --definition-file=schemas/pick_event.avsc
 gcloud pubsub schemas create receiving_schema --project=$PROJECT --type=avro --definition-file=schemas/receipt_event.avsc
 
-gcloud pubsub topics update picking-events --project=$PROJECT --schema=picking_schema --message-encoding=json
-gcloud pubsub topics update receiving-events --project=$PROJECT --schema=receiving_schema --message-encoding=json
+gcloud pubsub topics update picking-events --project=$PROJECT --schema=picking_schema --message-encoding=$ENCODING
+gcloud pubsub topics update receiving-events --project=$PROJECT --schema=receiving_schema --message-encoding=$ENCODING
 
-# Tables must exist
-bq mk --table $PROJECT:$DATASET.fact_pick event_ts:TIMESTAMP,order_id:STRING,sku:STRING,qty:INT64,location_id:STRING,staff:STRING
-bq mk --table $PROJECT:$DATASET.fact_receipt event_ts:TIMESTAMP,sku:STRING,qty:INT64,location_id:STRING,supplier:STRING
+# Tables must exist (day-partitioned on event_ts, clustered by SKU; same spec as scripts/schema_manager.py)
+bq mk --table --time_partitioning_field=event_ts --time_partitioning_type=DAY --clustering_fields=sku,location_id \
+  $PROJECT:$DATASET.fact_pick event_ts:TIMESTAMP,order_id:STRING,sku:STRING,qty:INT64,location_id:STRING,staff:STRING
+bq mk --table --time_partitioning_field=event_ts --time_partitioning_type=DAY --clustering_fields=sku \
+  $PROJECT:$DATASET.fact_receipt event_ts:TIMESTAMP,sku:STRING,qty:INT64,location_id:STRING,supplier:STRING
 
 # Subscriptions (Storage Write API)
 gcloud pubsub subscriptions create picking-to-bq --project=$PROJECT \
@@ -0,0 +1,495 @@
+#!/usr/bin/env python3
+"""Real-time stream processor for PickEvent / ReceiptEvent.
+
+Consumes both event types in micro-batches and keeps, in memory:
+  - on_hand per (sku, location_id) and per sku
+  - rolling pick velocity per sku (time-decayed EWMA, units/day)
+  - stockout ETA per sku (on_hand / velocity, days)
+
+Emits an alert when a SKU's ETA drops below --alert-days (once, until it
+recovers), writes compact state snapshots every --snapshot-every seconds and
+checkpoints state + source position so a restart resumes without replay.
+With a checkpoint, Pub/Sub messages are acked only after the checkpoint that
+includes them is written (deadlines are extended meanwhile), so a crash
+redelivers them instead of losing them.
+
+Sources are pluggable: a JSONL file (local stand-in, tail-able), an in-process
+queue, or a Pub/Sub pull subscription.
+
+Usage:
+  python stream_processor.py --source file --path events.jsonl \
+    --checkpoint state.ckpt --snapshot-out snapshots.jsonl --alerts-out alerts.jsonl
+  python stream_processor.py --source pubsub --project <id> \
+    --subscription picking-events-sub --subscription receiving-events-sub \
+    --seed-dataset whadb
+"""
+import argparse, json, math, os, pickle, queue, sys, time
+from datetime import datetime, timezone
+
+try:
+    from event_producer import decode_message
+except ImportError:
+    from scripts.event_producer import decode_message
+
+PICK, RECEIPT = "pick", "receipt"
+DAY = 86400.0
+
+
+def parse_ts(value) -> float:
+    """Event timestamp (ISO string or epoch seconds/millis) -> epoch seconds. Naive ISO is UTC."""
+    if isinstance(value, (int, float)):
+        return value / 1000.0 if value > 1e11 else float(value)
+    if value.endswith(("Z", "z")):  # fromisoformat only accepts "Z" from Python 3.11
+        value = value[:-1] + "+00:00"
+    dt = datetime.fromisoformat(value)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def event_type(ev: dict) -> str:
+    t = ev.get("event_type")
+    if t:
+        return t
+    return PICK if "order_id" in ev else RECEIPT
+
+
+# ---- sources ----------------------------------------------------------------
+
+class FileSource:
+    """JSONL file of events. position() is a byte offset, so restarts are exact."""
+
+    def __init__(self, path: str, follow: bool = False):
+        self.path = path
+        self.follow = follow
+        self._fh = open(path, "rb")
+        self._eof = False
+
+    def seek(self, position):
+        self._fh.seek(position or 0)
+
+    def position(self):
+        return self._fh.tell()
+
+    def poll(self, max_events: int, timeout: float) -> list:
+        out = []
+        readline = self._fh.readline
+        loads = json.loads
+        deadline = time.monotonic() + timeout
+        while len(out) < max_events:
+            line = readline()
+            if not line:
+                self._eof = not self.follow
+                if not self.follow or time.monotonic() >= deadline:
+                    break
+                time.sleep(0.05)
+                continue
+            if not line.endswith(b"\n") and self.follow:
+                # Partial write; re-read it on the next poll.
+                self._fh.seek(-len(line), os.SEEK_CUR)
+                if time.monotonic() >= deadline:
+                    break
+                time.sleep(0.05)
+                continue
+            line = line.strip()
+            if line:
+                out.append(loads(line))
+        return out
+
+    def exhausted(self) -> bool:
+        return self._eof
+
+    def commit(self):
+        pass
+
+    def close(self):
+        self._fh.close()
+
+
+class QueueSource:
+    """In-process queue.Queue of event dicts (tests, local producers). None ends the stream."""
+
+    def __init__(self, q: "queue.Queue"):
+        self.q = q
+        self._done = False
+
+    def seek(self, position):
+        pass
+
+    def position(self):
+        return None
+
+    def poll(self, max_events: int, timeout: float) -> list:
+        out = []
+        try:
+            item = self.q.get(timeout=timeout)
+        except queue.Empty:
+            return out
+        while True:
+            if item is None:
+                self._done = True
+                break
+            out.append(item)
+            if len(out) >= max_events:
+                break
+            try:
+                item = self.q.get_nowait()
+            except queue.Empty:
+                break
+        return out
+
+    def exhausted(self) -> bool:
+        return self._done
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class PubSubSource:
+    """Synchronous pull from one or more subscriptions; acks on commit().
+
+    Messages pulled but not yet committed have their ack deadline extended to
+    ack_deadline seconds, and re-extended as it runs down, so they can wait for
+    the next checkpoint without being redelivered.
+    """
+
+    MAX_IDS_PER_REQUEST = 1000
+
+    def __init__(self, project: str, subscriptions, ack_deadline: int = 120):
+        try:
+            from google.cloud import pubsub_v1
+        except Exception as e:
+            raise SystemExit("google-cloud-pubsub not installed. pip install google-cloud-pubsub") from e
+        self._client = pubsub_v1.SubscriberClient()
+        self._paths = [self._client.subscription_path(project, s) for s in subscriptions]
+        self._pending = {p: [] for p in self._paths}
+        self.ack_deadline = min(600, ack_deadline)   # Pub/Sub maximum is 600 s
+        self._last_extend = time.monotonic()
+
+    def seek(self, position):
+        pass  # Pub/Sub tracks delivery itself; unacked messages are redelivered.
+
+    def position(self):
+        return None
+
+    def _chunks(self, ack_ids):
+        for i in range(0, len(ack_ids), self.MAX_IDS_PER_REQUEST):
+            yield ack_ids[i:i + self.MAX_IDS_PER_REQUEST]
+
+    def _extend(self, path, ack_ids):
+        for chunk in self._chunks(ack_ids):
+            self._client.modify_ack_deadline(request={
+                "subscription": path, "ack_ids": chunk, "ack_deadline_seconds": self.ack_deadline})
+
+    def poll(self, max_events: int, timeout: float) -> list:
+        out = []
+        per_sub = max(1, max_events // len(self._paths))
+        refresh = time.monotonic() - self._last_extend >= self.ack_deadline / 3
+        for path in self._paths:
+            resp = self._client.pull(
+                request={"subscription": path, "max_messages": per_sub},
+                timeout=timeout,
+            )
+            new_ids = []
+            for m in resp.received_messages:
+                out.append(decode_message(m.message.data, dict(m.message.attributes)))
+                new_ids.append(m.ack_id)
+            # Re-extend everything still unacked when due, otherwise just the new messages
+            self._extend(path, self._pending[path] + new_ids if refresh else new_ids)
+            self._pending[path].extend(new_ids)
+        if refresh:
+            self._last_extend = time.monotonic()
+        return out
+
+    def exhausted(self) -> bool:
+        return False
+
+    def commit(self):
+        for path, ack_ids in self._pending.items():
+            for chunk in self._chunks(ack_ids):
+                self._client.acknowledge(request={"subscription": path, "ack_ids": chunk})
+            ack_ids.clear()
+
+    def close(self):
+        self._client.close()
+
+
+# ---- sinks ------------------------------------------------------------------
+
+class JsonlSink:
+    def __init__(self, path: str):
+        self._fh = open(path, "a", encoding="utf-8")
+
+    def __call__(self, rows: list):
+        self._fh.writelines(json.dumps(r, separators=(",", ":")) + "\n" for r in rows)
+        self._fh.flush()
+
+
+class BigQuerySink:
+    def __init__(self, table_id: str, project: str = None):
+        from google.cloud import bigquery
+        self._client = bigquery.Client(project=project)
+        self._table = table_id
+
+    def __call__(self, rows: list):
+        for i in range(0, len(rows), 500):
+            errors = self._client.insert_rows_json(self._table, rows[i:i + 500])
+            if errors:
+                print(f"Insert errors into {self._table}: {errors}", file=sys.stderr)
+
+
+# ---- processor --------------------------------------------------------------
+
+class StreamProcessor:
+    def __init__(self, alert_days: float = 3.0, window_days: float = 7.0,
+                 on_alert=None, on_snapshot=None):
+        self.alert_days = alert_days
+        self.tau = window_days * DAY
+        self.on_alert = on_alert
+        self.on_snapshot = on_snapshot
+
+        self.loc_on_hand = {}   # (sku, location_id) -> qty
+        self.sku_on_hand = {}   # sku -> qty
+        self.rate = {}          # sku -> units/second (EWMA)
+        self.rate_ts = {}       # sku -> epoch seconds of last rate update
+        self.alerting = set()   # skus currently below alert_days
+        self.watermark = 0.0    # max event time seen
+        self.events = 0
+
+    # -- state --------------------------------------------------------------
+
+    def seed(self, stock_rows=(), velocity_rows=(), ts: float = None):
+        """Initialise from fact_stock_snapshot / sku_velocity style rows."""
+        ts = time.time() if ts is None else ts
+        for r in stock_rows:
+            key = (r["sku"], r.get("location_id") or "")
+            qty = int(r["on_hand"] or 0)
+            self.loc_on_hand[key] = self.loc_on_hand.get(key, 0) + qty
+            self.sku_on_hand[r["sku"]] = self.sku_on_hand.get(r["sku"], 0) + qty
+        for r in velocity_rows:
+            self.rate[r["sku"]] = float(r["picks_per_day"] or 0) / DAY
+            self.rate_ts[r["sku"]] = ts
+        self.watermark = max(self.watermark, ts)
+
+    def state(self) -> dict:
+        return {
+            "loc_on_hand": self.loc_on_hand, "sku_on_hand": self.sku_on_hand,
+            "rate": self.rate, "rate_ts": self.rate_ts, "alerting": self.alerting,
+            "watermark": self.watermark, "events": self.events,
+        }
+
+    def restore(self, state: dict):
+        for k, v in state.items():
+            setattr(self, k, v)
+
+    # -- hot path -----------------------------------------------------------
+
+    def apply(self, batch: list) -> list:
+        """Apply a micro-batch; returns alerts raised by it."""
+        loc_on_hand, sku_on_hand = self.loc_on_hand, self.sku_on_hand
+        rate, rate_ts = self.rate, self.rate_ts
+        tau, exp = self.tau, math.exp
+        touched = set()
+        wm = self.watermark
+
+        for ev in batch:
+            sku = ev["sku"]
+            qty = int(ev["qty"])
+            ts = parse_ts(ev["event_ts"])
+            if ts > wm:
+                wm = ts
+            key = (sku, ev.get("location_id") or "")
+            if event_type(ev) == PICK:
+                loc_on_hand[key] = loc_on_hand.get(key, 0) - qty
+                sku_on_hand[sku] = sku_on_hand.get(sku, 0) - qty
+                last = rate_ts.get(sku)
+                if last is None:
+                    rate[sku] = qty / tau
+                    rate_ts[sku] = ts
+                else:
+                    dt = ts - last
+                    if dt > 0:
+                        rate[sku] = rate[sku] * exp(-dt / tau) + qty / tau
+                        rate_ts[sku] = ts
+                    else:  # out-of-order event: count it without rewinding time
+                        rate[sku] += qty / tau
+            else:
+                loc_on_hand[key] = loc_on_hand.get(key, 0) + qty
+                sku_on_hand[sku] = sku_on_hand.get(sku, 0) + qty
+            touched.add(sku)
+
+        self.watermark = wm
+        self.events += len(batch)
+        return self._check_alerts(touched)
+
+    def velocity(self, sku: str) -> float:
+        """Units/day, decayed to the current watermark."""
+        r = self.rate.get(sku, 0.0)
+        if not r:
+            return 0.0
+        dt = max(0.0, self.watermark - self.rate_ts[sku])
+        return r * math.exp(-dt / self.tau) * DAY
+
+    def eta_days(self, sku: str):
+        on_hand = self.sku_on_hand.get(sku, 0)
+        if on_hand <= 0:
+            return 0.0
+        v = self.velocity(sku)
+        return on_hand / v if v > 0 else None
+
+    def _check_alerts(self, skus) -> list:
+        alerts = []
+        for sku in skus:
+            eta = self.eta_days(sku)
+            low = eta is not None and eta < self.alert_days
+            if low and sku not in self.alerting:
+                self.alerting.add(sku)
+                alerts.append({
+                    "sku": sku, "alert": "STOCKOUT_RISK",
+                    "on_hand": self.sku_on_hand.get(sku, 0),
+                    "velocity_per_day": round(self.velocity(sku), 3),
+                    "est_days_until_stockout": round(eta, 2),
+                    "event_ts": datetime.fromtimestamp(self.watermark, timezone.utc).isoformat(),
+                })
+            elif not low and sku in self.alerting:
+                self.alerting.discard(sku)
+        if alerts and self.on_alert:
+            self.on_alert(alerts)
+        return alerts
+
+    def snapshot(self) -> list:
+        """Compact per-SKU rows: on_hand, velocity, ETA."""
+        ts = datetime.fromtimestamp(self.watermark, timezone.utc).isoformat()
+        rows = []
+        for sku, on_hand in self.sku_on_hand.items():
+            eta = self.eta_days(sku)
+            rows.append({
+                "snapshot_ts": ts, "sku": sku, "on_hand": on_hand,
+                "velocity_per_day": round(self.velocity(sku), 3),
+                "est_days_until_stockout": None if eta is None else round(eta, 2),
+            })
+        return rows
+
+
+# ---- checkpointing ----------------------------------------------------------
+
+def save_checkpoint(path: str, processor: StreamProcessor, position):
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as fh:
+        pickle.dump({"state": processor.state(), "position": position}, fh,
+                    protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+
+def load_checkpoint(path: str):
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, "rb") as fh:
+        return pickle.load(fh)
+
+
+def run(source, processor: StreamProcessor, batch_size: int = 5000, poll_timeout: float = 0.5,
+        checkpoint: str = None, checkpoint_every: float = 30.0, snapshot_every: float = 60.0):
+    """Main loop. Returns when a finite source is exhausted.
+
+    With a checkpoint, source.commit() (Pub/Sub ack) runs only after
+    save_checkpoint, so everything acked is covered by the saved state.
+    """
+    ckpt = load_checkpoint(checkpoint)
+    if ckpt:
+        processor.restore(ckpt["state"])
+        source.seek(ckpt["position"])
+        print(f"Resumed from {checkpoint} at {processor.events} events.")
+
+    last_ckpt = last_snap = time.monotonic()
+    started, start_events = time.monotonic(), processor.events
+    try:
+        while True:
+            batch = source.poll(batch_size, poll_timeout)
+            if batch:
+                processor.apply(batch)
+                if not checkpoint:
+                    source.commit()
+            now = time.monotonic()
+            if processor.on_snapshot and now - last_snap >= snapshot_every:
+                processor.on_snapshot(processor.snapshot())
+                last_snap = now
+            if checkpoint and now - last_ckpt >= checkpoint_every:
+                save_checkpoint(checkpoint, processor, source.position())
+                source.commit()
+                last_ckpt = now
+            if not batch and source.exhausted():
+                break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if processor.on_snapshot:
+            processor.on_snapshot(processor.snapshot())
+        if checkpoint:
+            save_checkpoint(checkpoint, processor, source.position())
+            source.commit()
+        source.close()
+
+    elapsed = time.monotonic() - started
+    n = processor.events - start_events
+    print(f"Processed {n} events in {elapsed:.2f}s ({n / max(elapsed, 1e-9):,.0f} ev/s).")
+
+
+def seed_from_bigquery(processor: StreamProcessor, project: str, dataset: str):
+    from google.cloud import bigquery
+    client = bigquery.Client(project=project)
+    ds = f"{project}.{dataset}"
+    stock = client.query(f"SELECT sku, location_id, on_hand FROM `{ds}.fact_stock_snapshot`").result()
+    velocity = client.query(f"SELECT sku, picks_per_day FROM `{ds}.sku_velocity`").result()
+    processor.seed((dict(r) for r in stock), (dict(r) for r in velocity))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--source", choices=["file", "pubsub"], default="file")
+    ap.add_argument("--path", help="JSONL events file (--source file)")
+    ap.add_argument("--follow", action="store_true", help="tail the file for new events")
+    ap.add_argument("--project", default=os.getenv("GCP_PROJECT_ID"))
+    ap.add_argument("--subscription", action="append", default=[])
+    ap.add_argument("--seed-dataset", default=None, help="seed on_hand/velocity from this BQ dataset")
+    ap.add_argument("--batch-size", type=int, default=5000)
+    ap.add_argument("--alert-days", type=float, default=3.0)
+    ap.add_argument("--window-days", type=float, default=7.0, help="velocity EWMA time constant")
+    ap.add_argument("--checkpoint", default=None)
+    ap.add_argument("--checkpoint-every", type=float, default=30.0)
+    ap.add_argument("--snapshot-every", type=float, default=60.0)
+    ap.add_argument("--snapshot-out", default=None, help="JSONL path or bq:<project.dataset.table>")
+    ap.add_argument("--alerts-out", default=None, help="JSONL path or bq:<project.dataset.table>")
+    args = ap.parse_args()
+
+    def sink(target):
+        if not target:
+            return None
+        if target.startswith("bq:"):
+            return BigQuerySink(target[3:], project=args.project)
+        return JsonlSink(target)
+
+    processor = StreamProcessor(alert_days=args.alert_days, window_days=args.window_days,
+                                on_alert=sink(args.alerts_out), on_snapshot=sink(args.snapshot_out))
+
+    if args.source == "file":
+        if not args.path:
+            raise SystemExit("--path is required for --source file")
+        source = FileSource(args.path, follow=args.follow)
+    else:
+        if not args.project or not args.subscription:
+            raise SystemExit("--project and --subscription are required for --source pubsub")
+        source = PubSubSource(args.project, args.subscription)
+
+    if args.seed_dataset and not load_checkpoint(args.checkpoint):
+        seed_from_bigquery(processor, args.project, args.seed_dataset)
+
+    run(source, processor, batch_size=args.batch_size, checkpoint=args.checkpoint,
+        checkpoint_every=args.checkpoint_every, snapshot_every=args.snapshot_every)
+
+
+if __name__ == "__main__":
+    main()